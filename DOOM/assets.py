@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+from time import perf_counter
+from typing import Dict
+
+import numpy as np
+import pygame
+from pygame import Rect
+
+from utilities import *
+
+
+class AssetCache:
+	def __init__(self, directory: str = ASSET_CACHE_DIRECTORY, enabled: bool = ASSET_CACHE_ENABLED) -> None:
+		self.directory = directory
+		self.enabled = enabled
+
+		# Statistics
+		self.hits = 0
+		self.misses = 0
+		self.load_time = 0.0
+
+	@staticmethod
+	def reference(alpha: bool) -> Surface:
+		surface: Surface = Surface((1, 1), pygame.SRCALPHA if alpha else 0)
+		return surface.convert_alpha() if alpha else surface.convert()
+
+	@staticmethod
+	def load(path: str, alpha: bool) -> Surface:
+		image: Surface = pygame.image.load(path)
+		return image.convert_alpha() if alpha else image.convert()
+
+	def key(self, paths: List[str], alpha: bool) -> str:
+		reference: Surface = self.reference(alpha)
+		digest = hashlib.sha1(repr((alpha, reference.get_bitsize(), reference.get_masks())).encode())
+
+		# File stats stand in for the contents, so a cache hit does not read the source images at all
+		for path in paths:
+			stat: os.stat_result = os.stat(path)
+			digest.update(repr((path, stat.st_size, stat.st_mtime_ns)).encode())
+
+		return digest.hexdigest()
+
+	@staticmethod
+	def shelves(sizes: List[Tuple[int, int]], width: int) -> Tuple[List[Rect], int]:
+		rects: List[Optional[Rect]] = [None] * len(sizes)
+		x = y = shelf = 0
+
+		# Shelf packing, tallest frames first
+		for i in sorted(range(len(sizes)), key=lambda i: -sizes[i][1]):
+			frame_width, frame_height = sizes[i]
+
+			if x + frame_width > width:
+				x, y, shelf = 0, y + shelf, 0
+
+			rects[i] = Rect(x, y, frame_width, frame_height)
+			x += frame_width
+			shelf = max(shelf, frame_height)
+
+		return rects, y + shelf
+
+	def pack(self, frames: List[Surface], alpha: bool) -> Tuple[Surface, List[Rect]]:
+		sizes: List[Tuple[int, int]] = [frame.get_size() for frame in frames]
+		widths: List[int] = sorted((width for width, _ in sizes), reverse=True)
+		width, rects, height = 0, [], 0
+
+		# Try every whole number of frames per shelf and keep the smallest atlas
+		for columns in range(1, len(sizes) + 1):
+			shelf_width: int = sum(widths[:columns])
+			shelf_rects, shelf_height = self.shelves(sizes, shelf_width)
+
+			if shelf_width > ASSET_ATLAS_SIZE or shelf_height > ASSET_ATLAS_SIZE:
+				continue
+
+			if not rects or shelf_width * shelf_height < width * height:
+				width, rects, height = shelf_width, shelf_rects, shelf_height
+
+		atlas: Surface = Surface((width, height), pygame.SRCALPHA if alpha else 0, frames[0])
+		pixels: np.ndarray = pygame.surfarray.pixels2d(atlas)
+
+		for frame, rect in zip(frames, rects):
+			pixels[rect.left:rect.right, rect.top:rect.bottom] = pygame.surfarray.pixels2d(frame)
+
+		del pixels
+		return atlas, rects
+
+	def read(self, name: str, key: str, alpha: bool) -> Optional[Tuple[Surface, List[Rect]]]:
+		path: str = os.path.join(self.directory, name)
+
+		try:
+			with open(f'{path}.json', 'r', encoding='utf-8') as file:
+				index: Dict = json.load(file)
+		except (OSError, ValueError):
+			return None
+
+		if index['key'] != key:
+			return None
+
+		atlas: Surface = Surface(index['size'], pygame.SRCALPHA if alpha else 0, self.reference(alpha))
+
+		if atlas.get_pitch() != index['pitch']:
+			return None
+
+		# Converted pixels are read straight into the surface, no decoding or format conversion
+		with open(f'{path}.pixels', 'rb') as file:
+			if os.fstat(file.fileno()).st_size != atlas.get_pitch() * atlas.get_height():
+				return None
+
+			file.readinto(np.frombuffer(atlas.get_buffer(), dtype=np.uint8))
+
+		return atlas, [Rect(rect) for rect in index['rects']]
+
+	def write(self, name: str, key: str, atlas: Surface, rects: List[Rect]) -> None:
+		os.makedirs(self.directory, exist_ok=True)
+		path: str = os.path.join(self.directory, name)
+
+		with open(f'{path}.pixels', 'wb') as file:
+			file.write(atlas.get_buffer().raw)
+
+		# The index is written last, so an interrupted build is never read back
+		with open(f'{path}.json', 'w', encoding='utf-8') as file:
+			json.dump({
+				'key': key,
+				'size': atlas.get_size(),
+				'pitch': atlas.get_pitch(),
+				'rects': [tuple(rect) for rect in rects]
+			}, file)
+
+	def atlas(self, name: str, groups: Dict[str, List[str]], alpha: bool = True) -> Dict[str, List[Surface]]:
+		start: float = perf_counter()
+		paths: List[str] = [path for group in groups.values() for path in group]
+
+		if not self.enabled:
+			frames: List[Surface] = [self.load(path, alpha) for path in paths]
+		else:
+			key: str = self.key(paths, alpha)
+			cached: Optional[Tuple[Surface, List[Rect]]] = self.read(name, key, alpha)
+
+			if cached is None:
+				self.misses += 1
+				cached = self.pack([self.load(path, alpha) for path in paths], alpha)
+				self.write(name, key, *cached)
+			else:
+				self.hits += 1
+
+			atlas, rects = cached
+			frames: List[Surface] = [atlas] if len(rects) == 1 else [atlas.subsurface(rect) for rect in rects]
+
+		result: Dict[str, List[Surface]] = {}
+		i: int = 0
+
+		for group, group_paths in groups.items():
+			result[group] = frames[i:i + len(group_paths)]
+			i += len(group_paths)
+
+		self.load_time += perf_counter() - start
+		return result
+
+	def image(self, path: str, alpha: bool = False) -> Surface:
+		return self.atlas(os.path.splitext(os.path.basename(path))[0], {'image': [path]}, alpha)['image'][0]
+
+	@property
+	def stats(self) -> Dict[str, Number]:
+		return {
+			'enabled': self.enabled,
+			'hits': self.hits,
+			'misses': self.misses,
+			'load_time': self.load_time
+		}
+
+
+asset_cache: AssetCache = AssetCache()
+
+
+def main() -> None:
+	# The game modules share the imported instance, not the one of this script
+	from assets import asset_cache
+	from drawing import Drawing
+	from map import level
+	from player import Player
+	from sprites import Sprites
+
+	# A hidden window keeps the converted pixel format identical to the game's
+	pygame.init()
+	screen: Surface = pygame.display.set_mode((WIDTH, HEIGHT), pygame.HIDDEN)
+	level.load()
+	sprites: Sprites = Sprites()
+	Drawing(screen, Surface(MINIMAP_RESOLUTION), Player(sprites), pygame.time.Clock())
+	pygame.quit()
+
+	print(f'{asset_cache.misses} atlases built, {asset_cache.hits} up to date in {asset_cache.directory}')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,283 @@
+import json
+import os
+import platform
+import tracemalloc
+from argparse import ArgumentParser, Namespace
+from contextlib import redirect_stdout
+from typing import Dict
+from warnings import filterwarnings
+
+filterwarnings('ignore')
+
+# Headless drivers, must be set before Pygame initializes
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+with redirect_stdout(None):
+	import pygame
+
+import numpy as np
+
+try:
+	import resource
+except ImportError:
+	resource = None
+
+from assets import asset_cache
+from drawing import Drawing
+from interaction import Interaction
+from map import level
+from player import Player
+from utilities import *
+from sprites import Sprites
+from startup import StartupProfiler, warm_up_kernels
+from ray_casting import set_ray_casting_threads
+from render_config import FrameGovernor, number_rays, render_config
+from timing import FrameTimer
+from controls import IdleInput, InputReplay
+from game import Game
+from simulation import state_digest
+from text import text_cache
+
+# Camera keyframes (x, y, angle) walked through the starting area of the default map
+CAMERA_PATH: List[Tuple[float, float, float]] = [
+	(150, 350, 0.0),
+	(450, 350, 0.0),
+	(450, 350, 1.5),
+	(450, 850, 1.5),
+	(450, 850, 0.0),
+	(950, 850, 0.0),
+	(950, 850, 3.1),
+	(450, 850, 3.1),
+	(450, 850, 4.7)
+]
+
+
+# Sprite mix of the stress scenario, NPCs are a third of it
+STRESS_TYPES: Tuple[int, ...] = SpriteType.BARREL, SpriteType.FLAME, SpriteType.SOLIDER
+
+
+def stress_placements(count: int, seed: int) -> List[Tuple[int, Position]]:
+	# Random points inside free tiles, the same for every run with the same seed
+	generator: np.random.Generator = np.random.default_rng(seed)
+	free_y, free_x = np.nonzero(level.tile_grid == VOID)
+	tiles: np.ndarray = generator.integers(0, len(free_x), count)
+	xs: np.ndarray = free_x[tiles] + generator.uniform(0.2, 0.8, count)
+	ys: np.ndarray = free_y[tiles] + generator.uniform(0.2, 0.8, count)
+
+	return [(STRESS_TYPES[i % len(STRESS_TYPES)], (x, y)) for i, (x, y) in enumerate(zip(xs.tolist(), ys.tolist()))]
+
+
+def load_camera_path(path_file: Optional[PathLikeString]) -> List[Tuple[float, float, float]]:
+	if path_file is None:
+		return CAMERA_PATH
+
+	with open(path_file, 'r', encoding='utf-8') as file:
+		return [(float(x), float(y), float(angle)) for x, y, angle in json.load(file)]
+
+
+def camera_at(camera_path: List[Tuple[float, float, float]], frame: int, frames: int) -> Tuple[float, float, float]:
+	position: float = frame / max(frames - 1, 1) * (len(camera_path) - 1)
+	index: int = min(int(position), len(camera_path) - 2)
+	t: float = position - index
+	(x1, y1, a1), (x2, y2, a2) = camera_path[index], camera_path[index + 1]
+
+	return x1 + (x2 - x1) * t, y1 + (y2 - y1) * t, a1 + (a2 - a1) * t
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+	ordered: List[float] = sorted(values)
+
+	def rank(q: float) -> float:
+		return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+	return {
+		'mean': sum(ordered) / len(ordered),
+		'p50': rank(0.50),
+		'p95': rank(0.95),
+		'p99': rank(0.99),
+		'max': ordered[-1]
+	}
+
+
+def run(arguments: Namespace) -> Dict:
+	pygame.init()
+	set_ray_casting_threads(arguments.threads)
+	render_config.set_number_rays(arguments.rays)
+	render_config.set_max_depth(arguments.draw_distance * TILE)
+	screen: Surface = pygame.display.set_mode((WIDTH, HEIGHT))
+	mini_map: Surface = Surface(MINIMAP_RESOLUTION)
+
+	# Startup
+	asset_cache.enabled = not arguments.no_asset_cache
+	profiler: StartupProfiler = StartupProfiler()
+
+	with profiler.phase('map build'):
+		level.load(arguments.map)
+
+	with profiler.phase('asset load'):
+		sprites: Sprites = Sprites([])
+
+	# Only the sprite instances are traced, their frames are shared by every sprite of a type
+	placements: List[Tuple[int, Position]] = (stress_placements(arguments.stress, arguments.seed)
+	                                          if arguments.stress else level.placements)
+	tracemalloc.start()
+
+	with profiler.phase('sprite spawn'):
+		sprites.spawn(placements)
+
+	sprite_memory: int = tracemalloc.get_traced_memory()[0]
+	tracemalloc.stop()
+
+	with profiler.phase('asset load'):
+		clock: pygame.time.Clock = pygame.time.Clock()
+		replay: Optional[InputReplay] = InputReplay(arguments.replay) if arguments.replay is not None else None
+		player: Player = Player(sprites, replay if replay is not None else IdleInput())
+		drawing: Drawing = Drawing(screen, mini_map, player, clock)
+		interaction: Interaction = Interaction(player, sprites, drawing)
+
+	warm_up_kernels(profiler, arguments.engine)
+	startup: Dict = {
+		'seconds': profiler.total / 1000,
+		'phases': profiler.phases,
+		'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource is not None else None,
+		'assets': asset_cache.stats
+	}
+
+	camera_path: List[Tuple[float, float, float]] = load_camera_path(arguments.path)
+
+	# A replay drives the player instead of the camera path, one recorded tick per measured frame
+	if replay is not None:
+		render_config.set_number_rays(replay.number_rays)
+		arguments.frames = replay.ticks
+		arguments.governor = False
+
+	timer: FrameTimer = FrameTimer(False, arguments.frames, arguments.trace)
+	governor: Optional[FrameGovernor] = FrameGovernor(render_config) if arguments.governor else None
+	ray_counts: List[int] = []
+
+	game: Game = Game(player, sprites, drawing, interaction, timer, arguments.engine, arguments.rendering)
+
+	for frame in range(-arguments.warmup, arguments.frames):
+		# Warm-up frames are not recorded, every frame is one simulation tick to keep runs reproducible
+		timer.enabled = frame >= 0
+		timer.begin_frame()
+
+		if replay is None:
+			player.x, player.y, player.angle = camera_at(camera_path, max(frame, 0), arguments.frames)
+
+		# A replay starts ticking with its first measured frame, the warm-up only draws its start
+		if (replay is None or frame >= 0) and not game.simulate(1 / TICK_RATE):
+			break
+
+		game.render()
+		timer.end_frame()
+		clock.tick()
+
+		if frame >= 0:
+			ray_counts.append(render_config.number_rays)
+
+		if governor is not None:
+			governor.update(clock.get_rawtime())
+
+	timer.close()
+	pygame.quit()
+
+	if not ray_counts:
+		raise SystemExit('The game was won before the first measured frame, a map without NPCs needs --stress')
+
+	return {
+		'frames': len(ray_counts),
+		'resolution': [WIDTH, HEIGHT],
+		'number_rays': arguments.rays,
+		'governor': {
+			'enabled': governor is not None,
+			'final_number_rays': render_config.number_rays,
+			'frames_per_number_rays': {rays: ray_counts.count(rays) for rays in sorted(set(ray_counts))}
+		},
+		'sprites': {
+			'count': len(placements),
+			'by_type': {sprite_type: [placement[0] for placement in placements].count(sprite_type)
+			            for sprite_type in sorted({placement[0] for placement in placements})},
+			'memory_bytes': sprite_memory,
+			'memory_per_sprite': sprite_memory / max(len(placements), 1),
+			'spawn_ms': profiler.phases['sprite spawn']
+		},
+		'replay': {
+			'file': arguments.replay,
+			'ticks': replay.tick,
+			'state_matches': state_digest(player, sprites) == replay.state_digest
+		} if replay is not None else None,
+		'floor': {
+			'enabled': FLOOR_CASTING,
+			'column_step': FLOOR_STEPS[drawing.floor_step],
+			'average_ms': drawing.floor_time
+		},
+		'hud': drawing.hud.stats,
+		'npc_scheduler': interaction.scheduler.stats,
+		'flow_field': interaction.flow_field.stats,
+		'engine': arguments.engine,
+		'threads': arguments.threads,
+		'rendering': arguments.rendering,
+		'startup': startup,
+		'machine': {
+			'system': platform.system(),
+			'machine': platform.machine(),
+			'processor': platform.processor(),
+			'python': platform.python_version(),
+			'cpus': os.cpu_count()
+		},
+		'caches': {
+			'wall_columns': drawing.wall_columns.stats,
+			'sprite_frames': sprites.frame_cache.stats,
+			'minimap_chunks': drawing.minimap.stats,
+			'text': text_cache.stats,
+			'line_of_sight': interaction.line_of_sight.stats,
+			'world_chunks': level.streamer.stats
+		},
+		'total': percentiles(list(timer.totals)),
+		'stages': {stage: percentiles(list(values)) for stage, values in timer.stages.items()}
+	}
+
+
+def main() -> None:
+	parser: ArgumentParser = ArgumentParser(description='Headless frame benchmark over a scripted camera path')
+	parser.add_argument('--frames', type=int, default=600, help='number of measured frames')
+	parser.add_argument('--warmup', type=int, default=30, help='frames rendered before measuring')
+	parser.add_argument('--map', default=MAP_FILE, help='text or binary map file')
+	parser.add_argument('--draw-distance', type=float, default=MAX_DRAW_DISTANCE / TILE,
+	                    help='maximum ray distance in tiles')
+	parser.add_argument('--stress', type=int, default=0, help='replace the map sprites with this many random ones')
+	parser.add_argument('--seed', type=int, default=0, help='random seed of the stress scenario')
+	parser.add_argument('--replay', default=None, help='drive the player with a recorded input file')
+	parser.add_argument('--path', default=None, help='JSON list of [x, y, angle] camera keyframes')
+	parser.add_argument('--engine', type=int, default=RAY_CASTING_ENGINE, help='ray casting engine')
+	parser.add_argument('--threads', type=int, default=RAY_CASTING_THREADS, help='threads for the parallel ray caster')
+	parser.add_argument('--rays', type=number_rays, default=NUMBER_RAYS,
+	                    help='initial number of rays, must divide the width')
+	parser.add_argument('--governor', action='store_true', help='adapt the number of rays to the frame time budget')
+	parser.add_argument('--rendering', type=int, default=WALL_RENDERING, help='wall rendering mode')
+	parser.add_argument('--no-asset-cache', action='store_true', help='decode every image instead of the asset cache')
+	parser.add_argument('--output', default='benchmark.json', help='JSON file for the results')
+	parser.add_argument('--trace', default=None, help='also write per-frame stage timings to a .csv or .jsonl file')
+	arguments: Namespace = parser.parse_args()
+
+	results: Dict = run(arguments)
+
+	with open(arguments.output, 'w', encoding='utf-8') as file:
+		json.dump(results, file, indent=4)
+
+	print(f'startup {results["startup"]["seconds"]:.3f} s, max RSS {results["startup"]["max_rss_kb"]} KB')
+	if results['replay'] is not None:
+		print(f'replayed {results["replay"]["ticks"]} ticks, final state '
+		      f'{"matches" if results["replay"]["state_matches"] else "differs"}')
+
+	print(f'{results["sprites"]["count"]} sprites, {results["sprites"]["memory_per_sprite"]:.0f} bytes per sprite')
+	print(f'{"stage":<20}{"p50":>10}{"p95":>10}{"p99":>10}')
+
+	for stage, values in list(results['stages'].items()) + [('total', results['total'])]:
+		print(f'{stage:<20}{values["p50"]:>10.3f}{values["p95"]:>10.3f}{values["p99"]:>10.3f}')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,184 @@
+from collections import OrderedDict
+from typing import Dict, Hashable
+
+import pygame
+from pygame import Rect
+
+from utilities import *
+
+
+def mipmap(texture: Surface, levels: int = MIPMAP_LEVELS) -> Surfaces:
+	mipmaps: Surfaces = [texture]
+
+	# Every level halves the one before it, smoothscale averages the texels it drops
+	for _ in range(levels - 1):
+		width, height = mipmaps[-1].get_size()
+		mipmaps.append(pygame.transform.smoothscale(mipmaps[-1], (max(width // 2, 1), max(height // 2, 1))))
+
+	return mipmaps
+
+
+def fogged(surface: Surface, fog_level: int) -> Surface:
+	fog: Surface = Surface(surface.get_size())
+	fog.fill(FOG_COLOR)
+	fog.set_alpha(fog_level * 255 // FOG_LEVELS)
+
+	shaded: Surface = surface.copy()
+	shaded.blit(fog, (0, 0))
+	return shaded
+
+
+class SurfaceCache:
+	def __init__(self, memory_limit: int, entry_limit: Optional[int] = None) -> None:
+		self.memory_limit = memory_limit
+		self.entry_limit = entry_limit if entry_limit is not None else memory_limit
+		self.memory = 0
+		self.surfaces: OrderedDict[Hashable, Surface] = OrderedDict()
+
+		# Statistics
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def __len__(self) -> int:
+		return len(self.surfaces)
+
+	def get(self, key: Hashable) -> Optional[Surface]:
+		surface: Optional[Surface] = self.surfaces.get(key)
+
+		if surface is None:
+			self.misses += 1
+			return None
+
+		self.hits += 1
+		self.surfaces.move_to_end(key)
+		return surface
+
+	def put(self, key: Hashable, surface: Surface) -> Surface:
+		size: int = self.surface_size(surface)
+
+		if size > self.entry_limit:
+			return surface
+
+		if key in self.surfaces:
+			self.memory -= self.surface_size(self.surfaces.pop(key))
+
+		while self.surfaces and self.memory + size > self.memory_limit:
+			_, evicted = self.surfaces.popitem(last=False)
+			self.memory -= self.surface_size(evicted)
+			self.evictions += 1
+
+		self.surfaces[key] = surface
+		self.memory += size
+		return surface
+
+	def clear(self) -> None:
+		self.surfaces.clear()
+		self.memory = 0
+
+	@staticmethod
+	def surface_size(surface: Surface) -> int:
+		return surface.get_pitch() * surface.get_height()
+
+	@property
+	def hit_rate(self) -> float:
+		return self.hits / (self.hits + self.misses) if self.hits + self.misses else 0.0
+
+	@property
+	def stats(self) -> Dict[str, Number]:
+		return {
+			'entries': len(self.surfaces),
+			'memory': self.memory,
+			'memory_limit': self.memory_limit,
+			'entry_limit': self.entry_limit,
+			'hits': self.hits,
+			'misses': self.misses,
+			'evictions': self.evictions,
+			'hit_rate': self.hit_rate
+		}
+
+
+class WallColumnCache:
+	def __init__(self, mipmaps: Dict[int, Surfaces], memory_limit: int = WALL_CACHE_MEMORY,
+	             height_step: int = WALL_CACHE_HEIGHT_STEP) -> None:
+		self.mipmaps = mipmaps
+		self.height_step = height_step
+		self.scaled = SurfaceCache(memory_limit)
+
+		# Column strip of every offset on every mip level, at least one texel wide
+		self.strips: List[List[Rect]] = []
+
+		for level in next(iter(mipmaps.values())):
+			size: int = level.get_height()
+			self.strips.append([Rect(offset * size // TILE, 0, max(size // TILE, 1), size) for offset in range(TILE)])
+
+		# Statistics
+		self.shaded = 0
+
+	def mipmap(self, texture: int, level: int, fog_level: int) -> Surface:
+		if not fog_level or level < WALL_FOG_MIPMAP_LEVEL:
+			return self.mipmaps[texture][level]
+
+		# Fogged copies of the small mip levels share the byte budget and the eviction order of the columns
+		key: Tuple[str, int, int, int] = 'mipmap', texture, level, fog_level
+		shaded: Optional[Surface] = self.scaled.get(key)
+
+		if shaded is None:
+			shaded = self.scaled.put(key, fogged(self.mipmaps[texture][level], fog_level))
+			self.shaded += 1
+
+		return shaded
+
+	def column(self, texture: int, offset: int, projection_height: int, scale: int = SCALE,
+	           fog_level: int = 0) -> Tuple[Surface, int]:
+		projection_height -= projection_height % self.height_step
+		key: Tuple[int, int, int, int, int] = texture, offset, projection_height, scale, fog_level
+		wall_column: Optional[Surface] = self.scaled.get(key)
+
+		if wall_column is None:
+			# The smallest mip level that is still at least as tall as the column
+			level: int = min(max((TEXTURE_SIZE // max(projection_height, 1)).bit_length() - 1, 0), len(self.strips) - 1)
+			strip: Surface = self.mipmap(texture, level, fog_level).subsurface(self.strips[level][offset])
+
+			if projection_height > HEIGHT:
+				size: int = strip.get_height()
+				texture_height: int = max(size * HEIGHT // projection_height, 1)
+				strip = strip.subsurface(0, (size - texture_height) // 2, strip.get_width(), texture_height)
+
+			column_height: int = min(max(projection_height, 1), HEIGHT)
+			wall_column = pygame.transform.scale(strip, (scale, column_height))
+
+			# Copying a large level for every fog level costs more than fogging the few columns cut from it
+			if fog_level and level < WALL_FOG_MIPMAP_LEVEL:
+				wall_column = fogged(wall_column, fog_level)
+
+			wall_column = self.scaled.put(key, wall_column)
+
+		return wall_column, max(HALF_HEIGHT - projection_height // 2, 0)
+
+	@property
+	def stats(self) -> Dict[str, Number]:
+		return {**self.scaled.stats, 'shaded_mipmaps': self.shaded}
+
+
+class ScaledFrameCache:
+	def __init__(self, memory_limit: int = SPRITE_CACHE_MEMORY, entry_limit: int = SPRITE_CACHE_ENTRY_MEMORY,
+	             size_step: int = SPRITE_CACHE_SIZE_STEP) -> None:
+		self.size_step = size_step
+		self.scaled = SurfaceCache(memory_limit, entry_limit)
+
+	def quantize(self, value: int) -> int:
+		return (value + self.size_step // 2) // self.size_step * self.size_step
+
+	def scale(self, frame: Surface, width: int, height: int) -> Surface:
+		key: Tuple[Surface, int, int] = frame, self.quantize(width), self.quantize(height)
+		scaled_frame: Optional[Surface] = self.scaled.get(key)
+
+		if scaled_frame is None:
+			scaled_frame = self.scaled.put(key, pygame.transform.scale(frame, key[1:]))
+
+		return scaled_frame
+
+	@property
+	def stats(self) -> Dict[str, Number]:
+		return self.scaled.stats
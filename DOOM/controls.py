@@ -0,0 +1,164 @@
+import struct
+from typing import BinaryIO
+
+import pygame
+
+from utilities import *
+
+
+# Player actions, one bit each in a tick's input
+class Action:
+	FORWARD: int = 1 << 0
+	BACKWARD: int = 1 << 1
+	LEFT: int = 1 << 2
+	RIGHT: int = 1 << 3
+	TURN_LEFT: int = 1 << 4
+	TURN_RIGHT: int = 1 << 5
+	SHOOT: int = 1 << 6
+	ZOOM: int = 1 << 7
+	QUIT: int = 1 << 8
+
+
+KEY_BINDINGS: Final[Tuple[Tuple[int, int], ...]] = (
+	(pygame.K_w, Action.FORWARD),
+	(pygame.K_s, Action.BACKWARD),
+	(pygame.K_a, Action.LEFT),
+	(pygame.K_d, Action.RIGHT),
+	(pygame.K_LEFT, Action.TURN_LEFT),
+	(pygame.K_RIGHT, Action.TURN_RIGHT),
+	(pygame.K_e, Action.SHOOT),
+	(pygame.K_ESCAPE, Action.QUIT)
+)
+
+# Input recordings: a header, then the actions and mouse movement of every tick
+INPUT_MAGIC: Final[bytes] = b'DINP'
+INPUT_VERSION: Final[int] = 1
+INPUT_HEADER: Final[struct.Struct] = struct.Struct('<4sHHHI16s')
+INPUT_RECORD: Final[struct.Struct] = struct.Struct('<Hh')
+
+
+@dataclass(frozen=True)
+class TickInput:
+	actions: int = 0
+	mouse: int = 0
+
+	def __contains__(self, action: int) -> bool:
+		return bool(self.actions & action)
+
+
+class LiveInput:
+	def poll(self) -> TickInput:
+		keys: pygame.key.ScancodeWrapper = pygame.key.get_pressed()
+		actions: int = 0
+
+		for key, action in KEY_BINDINGS:
+			if keys[key]:
+				actions |= action
+
+		for event in pygame.event.get():
+			if event.type == pygame.QUIT:
+				actions |= Action.QUIT
+
+			if event.type == pygame.KEYDOWN and event.key == pygame.K_TAB:
+				actions |= Action.ZOOM
+
+			if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+				actions |= Action.SHOOT
+
+		mouse: int = 0
+
+		if pygame.mouse.get_focused():
+			mouse = pygame.mouse.get_pos()[0] - HALF_WIDTH
+			pygame.mouse.set_pos((HALF_WIDTH, HALF_HEIGHT))
+
+		return TickInput(actions, mouse)
+
+	def pointer(self) -> Tuple[Position, bool]:
+		return pygame.mouse.get_pos(), bool(pygame.mouse.get_pressed()[0])
+
+	def quit_requested(self) -> bool:
+		return (any(event.type == pygame.QUIT for event in pygame.event.get())
+		        or bool(pygame.key.get_pressed()[pygame.K_ESCAPE]))
+
+
+class InputRecorder:
+	def __init__(self, source: LiveInput, path: PathLikeString, number_rays: int) -> None:
+		self.source = source
+		self.number_rays = number_rays
+		self.ticks = 0
+		self.file: BinaryIO = open(path, 'wb')
+		self.file.write(INPUT_HEADER.pack(INPUT_MAGIC, INPUT_VERSION, TICK_RATE, number_rays, 0, bytes(16)))
+
+	def poll(self) -> TickInput:
+		tick_input: TickInput = self.source.poll()
+
+		# The quitting tick ends the session, a replay quits when it runs out of ticks instead
+		if Action.QUIT not in tick_input:
+			self.file.write(INPUT_RECORD.pack(tick_input.actions, tick_input.mouse))
+			self.ticks += 1
+
+		return tick_input
+
+	def pointer(self) -> Tuple[Position, bool]:
+		return self.source.pointer()
+
+	def quit_requested(self) -> bool:
+		return self.source.quit_requested()
+
+	def close(self, state_digest: bytes) -> None:
+		# The tick count and the final game state are known only now, so the header is written again
+		self.file.seek(0)
+		self.file.write(INPUT_HEADER.pack(INPUT_MAGIC, INPUT_VERSION, TICK_RATE, self.number_rays, self.ticks,
+		                                  state_digest))
+		self.file.close()
+
+
+class InputReplay:
+	def __init__(self, path: PathLikeString) -> None:
+		with open(path, 'rb') as file:
+			magic, version, tick_rate, self.number_rays, self.ticks, self.state_digest = \
+				INPUT_HEADER.unpack(file.read(INPUT_HEADER.size))
+
+			if magic != INPUT_MAGIC or version != INPUT_VERSION:
+				raise ValueError(f'{path} is not an input recording')
+
+			if tick_rate != TICK_RATE:
+				raise ValueError(f'{path} was recorded at {tick_rate} ticks per second, not {TICK_RATE}')
+
+			self.records: List[Tuple[int, int]] = list(
+				INPUT_RECORD.iter_unpack(file.read(self.ticks * INPUT_RECORD.size))
+			)
+
+		self.tick = 0
+
+	@property
+	def finished(self) -> bool:
+		return self.tick >= len(self.records)
+
+	def poll(self) -> TickInput:
+		if self.finished:
+			return TickInput(Action.QUIT)
+
+		self.tick += 1
+		return TickInput(*self.records[self.tick - 1])
+
+	def pointer(self) -> Tuple[Position, bool]:
+		return (0, 0), False
+
+	def quit_requested(self) -> bool:
+		return self.finished
+
+
+class IdleInput:
+	# Scripted runs move the player themselves, every screen that waits for the player is left at once
+	def poll(self) -> TickInput:
+		return TickInput()
+
+	def pointer(self) -> Tuple[Position, bool]:
+		return (0, 0), False
+
+	def quit_requested(self) -> bool:
+		return True
+
+
+Controls: TypeAlias = LiveInput | InputRecorder | InputReplay | IdleInput
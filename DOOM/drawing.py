@@ -1,13 +1,21 @@
 from collections import deque
-from math import sin, cos, degrees
+from math import degrees
+from time import perf_counter
+from typing import Dict
 
+import numpy as np
 import pygame
 from pygame import Rect
-from pygame.font import Font
 from pygame.time import Clock
 
-from map import mini_map
+from assets import asset_cache
+from caches import WallColumnCache, fogged, mipmap
+from hud import HudCompositor
+from minimap import MiniMap
 from player import Player
+from ray_casting import cast_floor
+from render_config import render_config
+from text import text_cache
 from utilities import *
 
 
@@ -18,22 +26,55 @@ class Drawing:
 		self.player = player
 		self.clock = clock
 		self.textures = {
-			WALL1: pygame.image.load('../assets/images/wall 1.png').convert(),
-			WALL2: pygame.image.load('../assets/images/wall 2.png').convert(),
-			WALL3: pygame.image.load('../assets/images/wall 3.png').convert(),
-			WALL4: pygame.image.load('../assets/images/wall 4.png').convert(),
-			SKY: pygame.image.load('../assets/images/sky.png').convert(),
-			MENU: pygame.image.load('../assets/images/menu.png').convert()
+			WALL1: asset_cache.image('../assets/images/wall 1.png'),
+			WALL2: asset_cache.image('../assets/images/wall 2.png'),
+			WALL3: asset_cache.image('../assets/images/wall 3.png'),
+			WALL4: asset_cache.image('../assets/images/wall 4.png'),
+			SKY: asset_cache.image('../assets/images/sky.png'),
+			MENU: asset_cache.image('../assets/images/menu.png'),
+			FLOOR: asset_cache.image(FLOOR_TEXTURE_FILE)
 		}
+		self.mipmaps: Dict[int, Surfaces] = {
+			texture: mipmap(self.textures[texture]) for texture in (WALL1, WALL2, WALL3, WALL4)
+		}
+		self.wall_columns = WallColumnCache(self.mipmaps)
+		self.minimap = MiniMap()
+
+		# Framebuffer, the texture stack is only built when the framebuffer draws the walls
+		self.texture_stack: Optional[np.ndarray] = None
+		self.mipmap_bases = self.mipmap_sizes = np.empty(0, dtype=np.int64)
+		self.screen_rows = np.arange(HEIGHT)
+		self.column_scale = 0
+		self.column_rays = self.column_phases = self.screen_rows
+
+		# Fog, one translucent strip per fog level, as wide as a ray's columns
+		self.fog_scale = 0
+		self.fog_layers: List[Surface] = []
+
+		# Floor, one copy of the texture per fog level
+		floor_texture: Surface = pygame.transform.smoothscale(self.textures[FLOOR],
+		                                                      (FLOOR_TEXTURE_SIZE, FLOOR_TEXTURE_SIZE))
+		self.floor_textures = np.stack([
+			pygame.surfarray.array2d(fogged(floor_texture, fog_level)) for fog_level in range(FOG_LEVELS + 1)
+		]).view(np.uint32)
+		self.floor_rows = PROJECTION_COEFFICIENT / (2 * (np.arange(HALF_HEIGHT) + 0.5))
+		self.floor_columns = (np.arange(WIDTH) + 0.5) * FOV / WIDTH - HALF_FOV
+		self.floor_levels = np.zeros(HALF_HEIGHT, dtype=np.int64)
+		self.floor_depth: Optional[Tuple[float, float]] = None
+		self.floor_step = 0
+		self.floor_time = 0.0
 
 		# Menu
 		self.menu_trigger = True
 
 		# Player weapon
-		self.weapon_base_sprite = pygame.image.load('../assets/sprites/weapons/shotgun/base/0.png').convert_alpha()
-		self.weapon_shot_animation = deque([
-			pygame.image.load(f'../assets/sprites/weapons/shotgun/shot/{i}.png').convert_alpha() for i in range(20)
-		])
+		weapon: Dict[str, List[Surface]] = asset_cache.atlas('weapon', {
+			'base': ['../assets/sprites/weapons/shotgun/base/0.png'],
+			'shot': [f'../assets/sprites/weapons/shotgun/shot/{i}.png' for i in range(20)],
+			'sfx': [f'../assets/sprites/weapons/sfx/{i}.png' for i in range(9)]
+		})
+		self.weapon_base_sprite = weapon['base'][0]
+		self.weapon_shot_animation = deque(weapon['shot'])
 		self.weapon_rect = self.weapon_base_sprite.get_rect()
 		self.weapon_position = HALF_WIDTH - self.weapon_rect.width // 2, HEIGHT - self.weapon_rect.height
 		self.shot_length = len(self.weapon_shot_animation)
@@ -44,94 +85,230 @@ class Drawing:
 		self.shot_sound = pygame.mixer.Sound('../assets/music/shotgun.mp3')
 
 		# SFX
-		self.sfx = deque([
-			pygame.image.load(f'../assets/sprites/weapons/sfx/{i}.png').convert_alpha() for i in range(9)
-		])
+		self.sfx = deque(weapon['sfx'])
 		self.sfx_length_count = 0
 
 		# Defaults
 		self.shot_projection = 0
 
+		# HUD, retained layers that are only drawn again when what they show changes
+		self.hud = HudCompositor(screen)
+		self.hud.add('fps', Surface((0, 0)), FPS_LABEL_POSITION)
+		self.hud.add('mini_map', screen_map, MAP_POSITION)
+		self.hud.add('sfx', Surface((0, 0)))
+		self.hud.add('weapon', self.weapon_base_sprite, self.weapon_position)
+		self.hud.add('win', Surface((0, 0)))
+
 	def background(self, angle: float) -> None:
 		sky_offset: float = -5 * degrees(angle) % WIDTH
 		self.screen.blit(self.textures[SKY], (sky_offset, 0))
 		self.screen.blit(self.textures[SKY], (sky_offset - WIDTH, 0))
 		self.screen.blit(self.textures[SKY], (sky_offset + WIDTH, 0))
-		pygame.draw.rect(self.screen, DARK_GRAY, (0, HALF_HEIGHT, WIDTH, HALF_HEIGHT))
 
-	def world(self, world_objects: Walls) -> None:
-		for wall in sorted(world_objects, key=lambda x: x[0], reverse=True):
-			if wall[0]:
-				_, object_, object_position = wall
-				self.screen.blit(object_, object_position)
+		if FLOOR_CASTING:
+			self.floor(angle)
+		else:
+			pygame.draw.rect(self.screen, DARK_GRAY, (0, HALF_HEIGHT, WIDTH, HALF_HEIGHT))
+
+	def floor(self, angle: float) -> None:
+		start: float = perf_counter()
+
+		# Floor rows fade out like the walls at the same distance
+		if self.floor_depth != (render_config.max_depth, render_config.fog_start):
+			self.floor_depth = render_config.max_depth, render_config.fog_start
+			self.floor_levels[:] = np.clip((self.floor_rows - render_config.fog_start) * FOG_LEVELS
+			                               / max(render_config.max_depth - render_config.fog_start, 1), 0, FOG_LEVELS)
+
+		# Rows hold perpendicular distances, so the directions are stretched by the angle to the view axis
+		angles: np.ndarray = angle + self.floor_columns
+		cosines: np.ndarray = np.cos(self.floor_columns)
+		pixels: np.ndarray = pygame.surfarray.pixels2d(self.screen)
+		cast_floor(pixels, self.floor_textures, self.floor_rows, self.floor_levels, np.cos(angles) / cosines,
+		           np.sin(angles) / cosines, float(self.player.x), float(self.player.y), FLOOR_STEPS[self.floor_step])
+		del pixels
+
+		# Coarser columns when the floor runs over its budget, finer ones when there is room again, single slow
+		# frames are clamped so that they cannot move the average on their own
+		self.floor_time += (min((perf_counter() - start) * 1000, 2 * FLOOR_BUDGET) - self.floor_time) * 0.1
+
+		if self.floor_time > FLOOR_BUDGET and self.floor_step < len(FLOOR_STEPS) - 1:
+			self.floor_step += 1
+		elif self.floor_time < FLOOR_BUDGET / 3 and self.floor_step > 0:
+			self.floor_step -= 1
+
+	def world(self, walls: Walls) -> None:
+		# Wall columns never overlap, so they need no depth sorting
+		for _, object_, object_position in walls:
+			self.screen.blit(object_, object_position)
+
+	def build_texture_stack(self) -> None:
+		# Every mip level of every wall texture in one flat array
+		stack: List[np.ndarray] = [pygame.surfarray.array2d(self.mipmaps[texture][level]).ravel()
+		                           for level in range(MIPMAP_LEVELS) for texture in (WALL1, WALL2, WALL3, WALL4)]
+		self.texture_stack = np.concatenate(stack).view(np.uint32)
+		self.mipmap_bases = np.cumsum([0] + [len(texels) for texels in stack[:-1]]).reshape(MIPMAP_LEVELS, -1)
+		self.mipmap_sizes = np.array([mipmap_.get_height() for mipmap_ in self.mipmaps[WALL1]])
+
+	def set_column_scale(self, scale: int) -> None:
+		self.column_scale = scale
+		self.column_rays = np.arange(WIDTH) // scale
+		self.column_phases = np.arange(WIDTH) % scale
+
+	def set_fog_scale(self, scale: int) -> None:
+		self.fog_scale = scale
+		self.fog_layers = []
+
+		for fog_level in range(FOG_LEVELS + 1):
+			fog_layer: Surface = Surface((scale, HEIGHT))
+			fog_layer.fill(FOG_COLOR)
+			fog_layer.set_alpha(fog_level * 255 // FOG_LEVELS)
+			self.fog_layers.append(fog_layer)
+
+	def world_framebuffer(self, casted_walls: CastedWalls) -> None:
+		if self.texture_stack is None:
+			self.build_texture_stack()
+
+		if self.column_scale != render_config.scale:
+			self.set_column_scale(render_config.scale)
+
+		_, offsets, heights, textures = np.array(casted_walls).T
+		heights = np.maximum(heights.astype(np.int64), 1)
+		tops = HALF_HEIGHT - heights // 2
+
+		# Only the rows covered by at least one wall column
+		top, bottom = max(int(tops.min()), 0), min(int((tops + heights).max()), HEIGHT)
+		rows = self.screen_rows[top:bottom]
+
+		# Every ray samples the smallest mip level that is still at least as tall as its column
+		levels = np.clip(np.log2(TEXTURE_SIZE / heights), 0, MIPMAP_LEVELS - 1).astype(np.int64)
+		sizes = self.mipmap_sizes[levels]
+		bases = self.mipmap_bases[levels, np.maximum(textures.astype(np.int64), WALL1) - WALL1]
+
+		# Texture rows per ray, texture columns per screen column
+		v = (rows[None, :] - tops[:, None]) * sizes[:, None] // heights[:, None]
+		mask = ((v >= 0) & (v < sizes[:, None]) & (textures != VOID)[:, None])[self.column_rays]
+		np.clip(v, 0, sizes[:, None] - 1, out=v)
+		scale: int = self.column_scale
+		sizes = sizes[self.column_rays]
+		columns = (offsets.astype(np.int64)[self.column_rays] * scale + self.column_phases) * sizes // (TILE * scale)
+		columns = bases[self.column_rays] + columns * sizes
+
+		pixels: np.ndarray = pygame.surfarray.pixels2d(self.screen)
+		np.copyto(pixels[:, top:bottom], self.texture_stack.take(columns[:, None] + v[self.column_rays]), where=mask)
+		del pixels
+
+	def fog(self, casted_walls: CastedWalls, walls_shaded: bool = False) -> None:
+		depths, _, heights, textures = np.array(casted_walls).T
+
+		if depths.max() <= render_config.fog_start:
+			return
+
+		# Shaded wall columns carry their own fog, only the cut off rays are left
+		if walls_shaded:
+			depths = np.where(textures == VOID, depths, 0)
+
+		# Walls fade out towards the draw distance, cut off rays get solid fog
+		fog_levels: np.ndarray = np.clip((depths - render_config.fog_start) * FOG_LEVELS
+		                                 / max(render_config.max_depth - render_config.fog_start, 1), 0, FOG_LEVELS)
+		fog_levels = fog_levels.astype(np.int64)
+		fog_levels[textures == VOID] = FOG_LEVELS
+		heights = np.minimum(heights.astype(np.int64), HEIGHT)
+		scale: int = render_config.scale
+
+		if self.fog_scale != scale:
+			self.set_fog_scale(scale)
+
+		for ray in np.flatnonzero(fog_levels).tolist():
+			self.screen.blit(self.fog_layers[fog_levels[ray]], (ray * scale, HALF_HEIGHT - heights[ray] // 2),
+			                 (0, 0, scale, heights[ray]))
+
+	def world_sprites(self, sprites: ProjectedSprites) -> None:
+		for _, object_, (x, y), runs in sorted(sprites, key=lambda x: x[0], reverse=True):
+			for x0, x1 in runs:
+				self.screen.blit(object_, (x0, y), (x0 - x, 0, x1 - x0, object_.get_height()))
 
 	def fps(self) -> None:
-		font: Font = pygame.font.SysFont('Arial', 30, bold=True)
-		self.screen.blit(font.render(str(int(self.clock.get_fps())), 0, DARK_ORANGE), FPS_LABEL_POSITION)
+		fps: int = int(self.clock.get_fps())
+
+		if self.hud.stale('fps', fps):
+			self.hud.set('fps', text_cache.number(fps, FPS_FONT, DARK_ORANGE, False))
+
+		self.hud.blit('fps')
 
 	def mini_map(self, player: Player) -> None:
-		self.screen_map.fill(BLACK)
-		map_x, map_y = player.x // MAP_SCALE, player.y // MAP_SCALE
-		pygame.draw.line(self.screen_map, YELLOW, (map_x, map_y),
-		                 (map_x + 12 * cos(player.angle), map_y + 12 * sin(player.angle)), 3)
-		pygame.draw.circle(self.screen_map, RED, (map_x, map_y), 5)
+		self.minimap.set_zoom(player.minimap_zoom)
 
-		for x, y in mini_map:
-			pygame.draw.rect(self.screen_map, DARK_BROWN, (x, y, MAP_TILE, MAP_TILE))
+		if self.hud.stale('mini_map', self.minimap.state(player)):
+			self.minimap.draw(self.screen_map, player)
 
-		self.screen.blit(self.screen_map, MAP_POSITION)
+		self.hud.blit('mini_map')
 
 	def player_weapon(self, shots: List[Position | int]) -> None:
 		if self.player.shot:
-			if not self.shot_length_count:
-				self.shot_sound.play()
-
 			self.shot_projection = min(shots)[1] // 2
 			self.bullet_sfx()
-
-			shot_sprite: Surface = self.weapon_shot_animation[0]
-			self.screen.blit(shot_sprite, self.weapon_position)
-			self.shot_animation_count += 1
-
-			if self.shot_animation_count == self.shot_animation_speed:
-				self.weapon_shot_animation.rotate(-1)
-				self.shot_animation_count = 0
-				self.shot_length_count += 1
-				self.shot_animation_trigger = False
-
-			if self.shot_length_count == self.shot_length:
-				self.player.shot = False
-				self.shot_length_count = 0
-				self.sfx_length_count = 0
-				self.shot_animation_trigger = True
+			weapon: Surface = self.weapon_shot_animation[0]
 		else:
-			self.screen.blit(self.weapon_base_sprite, self.weapon_position)
+			weapon: Surface = self.weapon_base_sprite
+
+		if self.hud.stale('weapon', weapon):
+			self.hud.set('weapon', weapon)
+
+		self.hud.blit('weapon')
 
 	def bullet_sfx(self) -> None:
 		if self.sfx_length_count < len(self.sfx):
-			sfx: Surface = pygame.transform.scale(self.sfx[0], (self.shot_projection, self.shot_projection))
-			sfx_rect: Rect = sfx.get_rect()
-			self.screen.blit(sfx, (HALF_WIDTH - sfx_rect.w // 2, HALF_HEIGHT - sfx_rect.h // 2))
+			if self.hud.stale('sfx', (self.sfx[0], self.shot_projection)):
+				sfx: Surface = pygame.transform.scale(self.sfx[0], (self.shot_projection, self.shot_projection))
+				sfx_rect: Rect = sfx.get_rect()
+				self.hud.set('sfx', sfx, (HALF_WIDTH - sfx_rect.w // 2, HALF_HEIGHT - sfx_rect.h // 2))
+
+			self.hud.blit('sfx')
+
+	def weapon_tick(self) -> None:
+		if not self.player.shot:
+			return
+
+		if not self.shot_length_count and not self.shot_animation_count:
+			self.shot_sound.play()
+
+		if self.sfx_length_count < len(self.sfx):
 			self.sfx_length_count += 1
 			self.sfx.rotate(-1)
 
+		self.shot_animation_count += 1
+
+		if self.shot_animation_count == self.shot_animation_speed:
+			self.weapon_shot_animation.rotate(-1)
+			self.shot_animation_count = 0
+			self.shot_length_count += 1
+			self.shot_animation_trigger = False
+
+		if self.shot_length_count == self.shot_length:
+			self.player.shot = False
+			self.shot_length_count = 0
+			self.sfx_length_count = 0
+			self.shot_animation_trigger = True
+
 	def win(self) -> None:
-		font: Font = pygame.font.Font('../assets/fonts/font 1.ttf', 144)
-		rect: Rect = Rect(0, 0, 1000, 300)
-		rect.center = HALF_WIDTH, HALF_HEIGHT
-		pygame.draw.rect(self.screen, BLACK, rect, border_radius=50)
-		self.screen.blit(font.render('You win!', 1, RED), (rect.centerx - 350, rect.centery - 70))
-		pygame.display.flip()
+		# The banner is drawn once, the passes after it leave nothing to present
+		if self.hud.stale('win', 'You win!'):
+			banner: Surface = Surface((1000, 300), pygame.SRCALPHA)
+			rect: Rect = banner.get_rect()
+			pygame.draw.rect(banner, BLACK, rect, border_radius=50)
+			banner.blit(text_cache.render('You win!', WIN_FONT, RED), (rect.centerx - 350, rect.centery - 70))
+			self.hud.set('win', banner, rect.move(HALF_WIDTH - rect.centerx, HALF_HEIGHT - rect.centery).topleft)
+
+		self.hud.blit('win')
+		self.hud.present()
 
 	def menu(self) -> None:
 		x: int = 0
 
-		# Fonts
-		button_font: Font = Font('../assets/fonts/font 1.ttf', 72)
-		title_font: Font = Font('../assets/fonts/font 2.ttf', 400)
-
-		start: Surface = button_font.render('START', 1, LIGHT_GRAY)
-		exit_: Surface = button_font.render('EXIT', 1, LIGHT_GRAY)
+		# Labels
+		start: Surface = text_cache.render('START', MENU_BUTTON_FONT, LIGHT_GRAY)
+		exit_: Surface = text_cache.render('EXIT', MENU_BUTTON_FONT, LIGHT_GRAY)
+		title: Surface = text_cache.render('DOOMPy', MENU_TITLE_FONT, BLACK)
 
 		button_start: Rect = Rect(0, 0, 400, 150)
 		button_start.center = HALF_WIDTH, HALF_HEIGHT
@@ -141,12 +318,8 @@ class Drawing:
 
 		while self.menu_trigger:
 			# Check for exit
-			for event in pygame.event.get():
-				if event.type == pygame.QUIT:
-					pygame.quit()
-					exit()
-
-			if pygame.key.get_pressed()[pygame.K_ESCAPE]:
+			if self.player.controls.quit_requested():
+				pygame.quit()
 				exit()
 
 			# Draw
@@ -159,11 +332,10 @@ class Drawing:
 			pygame.draw.rect(self.screen, BLACK, button_exit, border_radius=25, width=10)
 			self.screen.blit(exit_, (button_exit.centerx - 85, button_exit.centery - 35))
 
-			self.screen.blit(title_font.render('DOOMPy', 1, BLACK), (15, -30))
+			self.screen.blit(title, (15, -30))
 
 			# Check for buttons
-			mouse_position: Position = pygame.mouse.get_pos()
-			mouse_click: int = pygame.mouse.get_pressed()[0]
+			mouse_position, mouse_click = self.player.controls.pointer()
 
 			if button_start.collidepoint(mouse_position):
 				pygame.draw.rect(self.screen, BLACK, button_start, border_radius=25)
@@ -0,0 +1,110 @@
+from drawing import Drawing
+from interaction import Interaction
+from player import Player
+from ray_casting import depth_buffer, ray_casting_columns, wall_columns
+from simulation import FixedTimestep
+from sprites import Sprites
+from timing import FrameTimer
+from utilities import *
+
+
+class Game:
+	def __init__(self, player: Player, sprites: Sprites, drawing: Drawing, interaction: Interaction, timer: FrameTimer,
+	             engine: int = RAY_CASTING_ENGINE, rendering: int = WALL_RENDERING) -> None:
+		self.player = player
+		self.sprites = sprites
+		self.drawing = drawing
+		self.interaction = interaction
+		self.timer = timer
+		self.engine = engine
+		self.rendering = rendering
+		self.timestep = FixedTimestep()
+
+	def tick(self, tick: int) -> bool:
+		timer: FrameTimer = self.timer
+
+		# Every stage keeps its own timing inside the simulation total
+		with timer.scope('input'):
+			self.player.poll()
+			self.player.snapshot()
+
+		with timer.scope('weapon_tick'):
+			self.drawing.weapon_tick()
+
+		with timer.scope('player_move'):
+			self.player.move()
+
+		with timer.scope('interaction'):
+			self.interaction.interaction_objects()
+
+		with timer.scope('npc_action'):
+			self.interaction.npc_action(tick)
+
+		with timer.scope('check_win'):
+			return not self.interaction.check_win()
+
+	def simulate(self, frame_time: float) -> bool:
+		# The game advances in fixed ticks, the frames only show it
+		with self.timer.scope('simulation'):
+			for tick in self.timestep.advance(frame_time):
+				if not self.tick(tick):
+					return False
+
+			self.sprites.tick = self.timestep.tick
+
+		return True
+
+	def render(self) -> None:
+		drawing: Drawing = self.drawing
+		timer: FrameTimer = self.timer
+
+		# Draw the player between the last two ticks
+		with self.player.interpolated(self.timestep.alpha):
+			with timer.scope('background'):
+				drawing.background(self.player.angle)
+
+			with timer.scope('ray_casting_walls'):
+				casted_walls, wall_shot = ray_casting_columns(self.player, self.engine)
+
+				if self.rendering == WallRendering.BLIT:
+					walls: Walls = wall_columns(casted_walls, drawing.textures, drawing.wall_columns)
+
+			with timer.scope('object_locate'):
+				world_objects: ProjectedSprites = self.sprites.locate(self.player, depth_buffer(casted_walls))
+
+			with timer.scope('world'):
+				if self.rendering == WallRendering.FRAMEBUFFER:
+					drawing.world_framebuffer(casted_walls)
+				else:
+					drawing.world(walls)
+
+				drawing.fog(casted_walls, self.rendering == WallRendering.BLIT and WALL_FOG_SHADING)
+				drawing.world_sprites(world_objects)
+
+			# The 3D view changes every frame, the HUD layers only add the regions they changed
+			drawing.hud.invalidate(VIEWPORT)
+
+			with timer.scope('fps'):
+				drawing.fps()
+
+			with timer.scope('mini_map'):
+				drawing.mini_map(self.player)
+
+			with timer.scope('sprite_shot'):
+				sprite_shot: Tuple[float, int] = self.sprites.sprite_shot
+
+			with timer.scope('player_weapon'):
+				drawing.player_weapon([wall_shot, sprite_shot])
+
+		# Other
+		timer.draw(drawing.screen)
+
+		with timer.scope('flip'):
+			drawing.hud.present()
+
+	def frame(self, frame_time: float) -> bool:
+		if not self.simulate(frame_time):
+			return False
+
+		self.render()
+		return True
@@ -0,0 +1,100 @@
+from typing import Dict, Hashable, Set
+
+import pygame
+from pygame import Rect
+
+from utilities import *
+
+
+class HudLayer:
+	def __init__(self, surface: Surface, position: Position = (0, 0)) -> None:
+		self.surface = surface
+		self.position = position
+		self.key: Hashable = None
+
+		# Statistics
+		self.redraws = 0
+
+	@property
+	def rect(self) -> Rect:
+		return self.surface.get_rect(topleft=self.position)
+
+
+class HudCompositor:
+	def __init__(self, screen: Surface) -> None:
+		self.screen = screen
+		self.layers: Dict[str, HudLayer] = {}
+		self.dirty: List[Rect] = []
+		self.shown: Set[str] = set()
+		self.last_shown: Set[str] = set()
+
+		# Statistics
+		self.frames = 0
+		self.full_updates = 0
+		self.reuses = 0
+
+	def add(self, name: str, surface: Surface, position: Position = (0, 0)) -> HudLayer:
+		self.layers[name] = HudLayer(surface, position)
+		return self.layers[name]
+
+	def stale(self, name: str, key: Hashable) -> bool:
+		layer: HudLayer = self.layers[name]
+
+		# A layer is only drawn again when the state it shows has changed
+		if key == layer.key:
+			self.reuses += 1
+			return False
+
+		layer.key = key
+		layer.redraws += 1
+		self.dirty.append(layer.rect)
+		return True
+
+	def set(self, name: str, surface: Surface, position: Optional[Position] = None) -> None:
+		layer: HudLayer = self.layers[name]
+		layer.surface = surface
+
+		if position is not None:
+			layer.position = position
+
+		self.dirty.append(layer.rect)
+
+	def blit(self, name: str) -> None:
+		layer: HudLayer = self.layers[name]
+		self.screen.blit(layer.surface, layer.position)
+		self.shown.add(name)
+
+	def invalidate(self, rect: Rect | Tuple[int, int, int, int]) -> None:
+		self.dirty.append(Rect(rect))
+
+	def present(self) -> None:
+		self.frames += 1
+
+		# Layers that were shown last frame and are gone now leave their area behind
+		for name in self.last_shown - self.shown:
+			self.dirty.append(self.layers[name].rect)
+
+		self.last_shown, self.shown = self.shown, set()
+
+		if not self.dirty:
+			return
+
+		# Regions that add up to most of the window are cheaper to send in one go
+		screen_rect: Rect = self.screen.get_rect()
+
+		if sum(rect.w * rect.h for rect in self.dirty) >= screen_rect.w * screen_rect.h // 2:
+			pygame.display.flip()
+			self.full_updates += 1
+		else:
+			pygame.display.update([rect.clip(screen_rect) for rect in self.dirty if rect.w and rect.h])
+
+		self.dirty.clear()
+
+	@property
+	def stats(self) -> Dict[str, Number]:
+		return {
+			'frames': self.frames,
+			'full_updates': self.full_updates,
+			'reuses': self.reuses,
+			**{f'{name}_redraws': layer.redraws for name, layer in self.layers.items()}
+		}
@@ -1,19 +1,31 @@
-from math import sin, cos, atan2
+from math import sin, cos, atan2, hypot
+from typing import Dict
 
+import numpy as np
 import pygame.mixer
 from numba import njit
-from numba.typed.typeddict import Dict as NumbaDict
 
 from drawing import Drawing
-from map import world_map
+from map import level, ChunkStreamer
+from pathfinding import FlowField
 from player import Player
 from ray_casting import mapping
+from render_config import render_config
+from simulation import NpcScheduler
 from sprites import Sprite, Sprites
 from utilities import *
 
 
 @njit(fastmath=True, cache=True)
-def ray_casting_npc_player(npc_x: float, npc_y: float, _world_map: NumbaDict, player_position: Position) -> bool:
+def is_wall(_tile_grid: np.ndarray, x: float, y: float) -> bool:
+	rows, columns = _tile_grid.shape
+	tile_x, tile_y = int(x // TILE), int(y // TILE)
+
+	return 0 <= tile_x < columns and 0 <= tile_y < rows and _tile_grid[tile_y, tile_x] != VOID
+
+
+@njit(fastmath=True, cache=True)
+def ray_casting_npc_player(npc_x: float, npc_y: float, _tile_grid: np.ndarray, player_position: Position) -> bool:
 	ox, oy = player_position
 	xm, ym = mapping(ox, oy)
 	delta_x, delta_y = ox - npc_x, oy - npc_y
@@ -27,9 +39,7 @@ def ray_casting_npc_player(npc_x: float, npc_y: float, _world_map: NumbaDict, pl
 	for i in range(0, int(abs(delta_x)) // TILE):
 		depth_v: float = (x - ox) / cos_a
 		yv: float = oy + depth_v * sin_a
-		tile_v: Position = mapping(x + dx, yv)
-
-		if tile_v in _world_map:
+		if is_wall(_tile_grid, x + dx, yv):
 			return False
 
 		x += dx * TILE
@@ -40,9 +50,7 @@ def ray_casting_npc_player(npc_x: float, npc_y: float, _world_map: NumbaDict, pl
 	for i in range(0, int(abs(delta_y)) // TILE):
 		depth_h: float = (y - oy) / sin_a
 		xh: float = ox + depth_h * cos_a
-		tile_h: Position = mapping(xh, y + dy)
-
-		if tile_h in _world_map:
+		if is_wall(_tile_grid, xh, y + dy):
 			return False
 
 		y += dy * TILE
@@ -50,19 +58,91 @@ def ray_casting_npc_player(npc_x: float, npc_y: float, _world_map: NumbaDict, pl
 	return True
 
 
+@njit(fastmath=True, cache=True)
+def ray_casting_npcs_player(npc_positions: np.ndarray, _tile_grid: np.ndarray, player_position: Position) -> np.ndarray:
+	visible: np.ndarray = np.empty(len(npc_positions), dtype=np.bool_)
+
+	for i in range(len(npc_positions)):
+		visible[i] = ray_casting_npc_player(npc_positions[i, 0], npc_positions[i, 1], _tile_grid, player_position)
+
+	return visible
+
+
+class LineOfSight:
+	def __init__(self, player: Player) -> None:
+		self.player = player
+		self.player_tile: Optional[Position] = None
+		self.visible: Dict[Position, bool] = {}
+
+		# Statistics
+		self.hits = 0
+		self.misses = 0
+
+	def check(self, sprites: List[Sprite]) -> List[bool]:
+		player_tile: Position = int(self.player.x // TILE), int(self.player.y // TILE)
+
+		# Cached results only hold while the player stays in the same tile
+		if player_tile != self.player_tile:
+			self.player_tile = player_tile
+			self.visible.clear()
+
+		npc_tiles: List[Position] = [(int(sprite.x // TILE), int(sprite.y // TILE)) for sprite in sprites]
+		missing: List[int] = [i for i, npc_tile in enumerate(npc_tiles) if npc_tile not in self.visible]
+		self.hits += len(sprites) - len(missing)
+		self.misses += len(missing)
+
+		# NPCs past the draw distance are never seen, the rest are traced through the resident window of chunks
+		streamer: ChunkStreamer = level.streamer
+		streamer.update(*self.player.position)
+		origin_x, origin_y = streamer.origin
+		max_depth: float = min(render_config.max_depth, streamer.reach)
+		in_range: List[int] = []
+
+		for i in missing:
+			if hypot(sprites[i].x - self.player.x, sprites[i].y - self.player.y) < max_depth:
+				in_range.append(i)
+			else:
+				self.visible[npc_tiles[i]] = False
+
+		if in_range:
+			npc_positions: np.ndarray = np.array([(sprites[i].x - origin_x, sprites[i].y - origin_y) for i in in_range],
+			                                     dtype=np.float64)
+			player_position: Position = self.player.position[0] - origin_x, self.player.position[1] - origin_y
+			visible: np.ndarray = ray_casting_npcs_player(npc_positions, streamer.window, player_position)
+
+			for i, is_visible in zip(in_range, visible.tolist()):
+				self.visible[npc_tiles[i]] = is_visible
+
+		return [self.visible[npc_tile] for npc_tile in npc_tiles]
+
+	@property
+	def hit_rate(self) -> float:
+		return self.hits / (self.hits + self.misses) if self.hits + self.misses else 0.0
+
+	@property
+	def stats(self) -> Dict[str, Number]:
+		return {'entries': len(self.visible), 'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate}
+
+
 class Interaction:
 	def __init__(self, player: Player, sprites: Sprites, drawing: Drawing) -> None:
 		self.player = player
 		self.sprites = sprites
 		self.drawing = drawing
+		self.line_of_sight = LineOfSight(player)
+		self.scheduler = NpcScheduler(player)
+		self.flow_field = FlowField(player)
 		self.pain_sound = pygame.mixer.Sound('../assets/music/pain.mp3')
 
 	def interaction_objects(self) -> None:
 		if self.player.shot and self.drawing.shot_animation_trigger:
+			# Aim from the simulated pose, not from the interpolated one of the last frame
+			self.sprites.update(self.player)
+
 			for sprite in sorted(self.sprites.list_of_objects, key=lambda x: x.distance_to_sprite):
 				if sprite.is_on_fire[1]:
 					if sprite.death_type != DeathType.IMMORTAL and not sprite.is_dead:
-						if ray_casting_npc_player(sprite.x, sprite.y, world_map, self.player.position):
+						if self.line_of_sight.check([sprite])[0]:
 							if sprite.flag == Flag.NPC:
 								self.pain_sound.play()
 
@@ -71,19 +151,41 @@ class Interaction:
 							self.drawing.shot_animation_trigger = False
 					break
 
-	def npc_action(self) -> None:
-		for sprite in self.sprites.list_of_objects:
-			if sprite.flag == Flag.NPC and not sprite.is_dead:
-				if ray_casting_npc_player(sprite.x, sprite.y, world_map, self.player.position):
-					sprite.npc_action_trigger = True
-					self.move(sprite)
-				else:
-					sprite.npc_action_trigger = False
-
-	def move(self, sprite: Sprite) -> None:
-		if sprite.distance_to_sprite > TILE:
-			sprite.x += 1 if sprite.x - self.player.x < 0 else -1
-			sprite.y += 1 if sprite.y - self.player.y < 0 else -1
+	def npc_action(self, tick: int = 0) -> None:
+		npcs: List[Sprite] = [sprite for sprite in self.sprites.list_of_objects
+		                      if sprite.flag == Flag.NPC and not sprite.is_dead]
+
+		# Distant and unseen NPCs think less often and make up for it with longer steps
+		scheduled: List[Tuple[Sprite, int]] = self.scheduler.due(npcs, tick)
+		visible: List[bool] = self.line_of_sight.check([sprite for sprite, _ in scheduled])
+		self.flow_field.update()
+
+		# NPCs that have spotted the player keep chasing it around corners along the flow field
+		for (sprite, ticks), is_visible in zip(scheduled, visible):
+			if is_visible:
+				sprite.npc_action_trigger = sprite.npc_alerted = True
+				self.move(sprite, ticks)
+			else:
+				sprite.npc_action_trigger = False
+
+				if sprite.npc_alerted:
+					self.pursue(sprite, ticks)
+
+	def move(self, sprite: Sprite, ticks: int = 1) -> None:
+		if hypot(sprite.x - self.player.x, sprite.y - self.player.y) > TILE:
+			step: int = NPC_SPEED * ticks
+			sprite.x += step if sprite.x - self.player.x < 0 else -step
+			sprite.y += step if sprite.y - self.player.y < 0 else -step
+			self.player.collision_grid.update(sprite)
+
+	def pursue(self, sprite: Sprite, ticks: int = 1) -> None:
+		target: Optional[Position] = self.flow_field.step(sprite.x, sprite.y)
+
+		if target is not None:
+			step: int = NPC_SPEED * ticks
+			sprite.x += min(max(target[0] - sprite.x, -step), step)
+			sprite.y += min(max(target[1] - sprite.y, -step), step)
+			self.player.collision_grid.update(sprite)
 
 	def play_music(self) -> None:
 		pygame.mixer.pre_init(44100, -16, 2, 2048)
@@ -91,20 +193,20 @@ class Interaction:
 		pygame.mixer.music.load('../assets/music/theme.mp3')
 		pygame.mixer.music.play(10)
 
-	def check_win(self) -> None:
-		if not [sprite for sprite in self.sprites.list_of_objects if sprite.flag == Flag.NPC and not sprite.is_dead]:
-			pygame.mixer.stop()
-			pygame.mixer.music.load('../assets/music/win.mp3')
-			pygame.mixer.music.play()
+	@property
+	def won(self) -> bool:
+		return not any(sprite.flag == Flag.NPC and not sprite.is_dead for sprite in self.sprites.list_of_objects)
+
+	def check_win(self) -> bool:
+		if not self.won:
+			return False
 
-			while True:
-				# Check for exit
-				for event in pygame.event.get():
-					if event.type == pygame.QUIT:
-						exit()
+		pygame.mixer.stop()
+		pygame.mixer.music.load('../assets/music/win.mp3')
+		pygame.mixer.music.play()
 
-				if pygame.key.get_pressed()[pygame.K_ESCAPE]:
-					exit()
+		# The win screen stays until the player quits, which ends the game
+		while not self.player.controls.quit_requested():
+			self.drawing.win()
 
-				# Draw
-				self.drawing.win()
+		return True
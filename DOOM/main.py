@@ -1,54 +1,122 @@
+from argparse import ArgumentParser, Namespace
 from contextlib import redirect_stdout
 from warnings import filterwarnings
 
+from startup import StartupProfiler, warm_up_kernels
+
+profiler: StartupProfiler = StartupProfiler()
 filterwarnings('ignore')
 
-# Disable Pygame welcome message
-with redirect_stdout(None):
-	import pygame
-	from pygame.time import Clock
+with profiler.phase('imports'):
+	# Disable Pygame welcome message
+	with redirect_stdout(None):
+		import pygame
+		from pygame.time import Clock
+
+	from drawing import Drawing
+	from interaction import Interaction
+	from map import level
+	from player import Player
+	from utilities import *
+	from sprites import Sprites
+	from game import Game
+	from ray_casting import set_ray_casting_threads
+	from render_config import FrameGovernor, number_rays, render_config
+	from simulation import state_digest
+	from controls import Controls, InputRecorder, InputReplay, LiveInput
+	from timing import FrameTimer
 
-from drawing import Drawing
-from interaction import Interaction
-from player import Player
-from utilities import *
-from sprites import Sprites
-from ray_casting import ray_casting_walls
+# Command line
+parser: ArgumentParser = ArgumentParser(description='DOOMPy')
+parser.add_argument('--timings', action='store_true', help='show the per-stage frame timing overlay')
+parser.add_argument('--trace', default=None, help='write per-frame stage timings to a .csv or .jsonl file')
+parser.add_argument('--threads', type=int, default=RAY_CASTING_THREADS, help='threads for the parallel ray caster')
+parser.add_argument('--rays', type=number_rays, default=NUMBER_RAYS,
+                    help='initial number of rays, must divide the width')
+parser.add_argument('--governor', action='store_true', help='adapt the number of rays to the frame time budget')
+parser.add_argument('--map', default=MAP_FILE, help='text or binary map file')
+parser.add_argument('--draw-distance', type=float, default=MAX_DRAW_DISTANCE / TILE,
+                    help='maximum ray distance in tiles')
+parser.add_argument('--record', default=None, help='record the input of every tick to this file')
+parser.add_argument('--replay', default=None, help='play a recorded input file instead of the live input')
+parser.add_argument('--profile-startup', action='store_true', help='print the startup time breakdown and exit')
+arguments: Namespace = parser.parse_known_args()[0]
+
+with profiler.phase('map build'):
+	level.load(arguments.map)
 
 # Initialize Pygame
-pygame.init()
+with profiler.phase('mixer init'):
+	pygame.mixer.init()
+
+with profiler.phase('display init'):
+	pygame.init()
+	set_ray_casting_threads(arguments.threads)
+	render_config.set_number_rays(arguments.rays)
+	render_config.set_max_depth(arguments.draw_distance * TILE)
+
+	# Hits are tested in ray units, so a replay must run with the ray count it was recorded with
+	if arguments.replay is not None:
+		controls: Controls = InputReplay(arguments.replay)
+		render_config.set_number_rays(controls.number_rays)
+	elif arguments.record is not None:
+		controls: Controls = InputRecorder(LiveInput(), arguments.record, render_config.number_rays)
+	else:
+		controls: Controls = LiveInput()
+
+	screen: Surface = pygame.display.set_mode((WIDTH, HEIGHT))
+	mini_map: Surface = Surface(MINIMAP_RESOLUTION)
 
 # Initialize variables
-screen: Surface = pygame.display.set_mode((WIDTH, HEIGHT))
-mini_map: Surface = Surface(MINIMAP_RESOLUTION)
+with profiler.phase('asset load'):
+	sprites: Sprites = Sprites(level.placements)
+	clock: Clock = Clock()
+	player: Player = Player(sprites, controls)
+	drawing: Drawing = Drawing(screen, mini_map, player, clock)
+	interaction: Interaction = Interaction(player, sprites, drawing)
+
+timer: FrameTimer = FrameTimer(arguments.timings or FRAME_TIMER_ENABLED, trace_file=arguments.trace)
+governor: Optional[FrameGovernor] = (FrameGovernor(render_config)
+                                     if (arguments.governor or RENDER_GOVERNOR_ENABLED)
+                                     and isinstance(controls, LiveInput) else None)
 
-sprites: Sprites = Sprites()
-clock: Clock = Clock()
-player: Player = Player(sprites)
-drawing: Drawing = Drawing(screen, mini_map, player, clock)
-interaction: Interaction = Interaction(player, sprites, drawing)
+# Compile every kernel before the first frame, later launches load them from the on-disk cache
+warm_up_kernels(profiler)
+
+if arguments.profile_startup:
+	print(profiler.report())
+	pygame.quit()
+	exit()
 
 interaction.play_music()
-drawing.menu()
+
+if not isinstance(controls, InputReplay):
+	drawing.menu()
+
+game: Game = Game(player, sprites, drawing, interaction, timer)
+frame_time: int = clock.tick()
 
 if __name__ == '__main__':
-	while True:
-		# Move
-		player.move()
-
-		# Draw
-		drawing.background(player.angle)
-		walls, wall_shot = ray_casting_walls(player, drawing.textures)
-		drawing.world(walls + [sprite.object_locate(player) for sprite in sprites.list_of_objects])
-		drawing.fps()
-		drawing.mini_map(player)
-		drawing.player_weapon([wall_shot, sprites.sprite_shot])
-
-		# Interaction
-		interaction.interaction_objects()
-		interaction.npc_action()
-		interaction.check_win()
-
-		# Other
-		pygame.display.flip()
-		clock.tick(FPS)
+	try:
+		while True:
+			timer.begin_frame()
+
+			# Quitting from the win screen ends the game
+			if not game.frame(frame_time / 1000):
+				break
+
+			timer.end_frame()
+			frame_time = clock.tick(FPS)
+
+			if governor is not None:
+				governor.update(clock.get_rawtime())
+	finally:
+		# Quitting ends up here, the trace is closed and the recording keeps the final state for replays to compare
+		# against
+		timer.close()
+
+		if isinstance(controls, InputRecorder):
+			controls.close(state_digest(player, sprites))
+		elif isinstance(controls, InputReplay):
+			matches: bool = state_digest(player, sprites) == controls.state_digest
+			print(f'replayed {controls.tick} of {controls.ticks} ticks, final state {"matches" if matches else "differs"}')
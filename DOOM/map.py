@@ -1,7 +1,12 @@
-from typing import Dict, Set
+import os
+import struct
+from argparse import ArgumentParser, Namespace
+from collections import defaultdict, OrderedDict
+from typing import Dict
 
+import numpy as np
 import pygame
-from numba import int32
+from numba import int32, njit
 from numba.core.types import UniTuple
 from numba.typed.typeddict import Dict as NumbaDict
 
@@ -22,20 +27,271 @@ def load_map(map_file: PathLikeString, separator: Optional[str] = ' ') -> List[L
 		return [[mapping.get(character) for character in line.strip().split(separator)] for line in file.readlines()]
 
 
-# Initialize
-map_array: List[List[int]] = load_map('../assets/data/map.txt')
-WORLD_WIDTH: Final[int] = len(map_array[0]) * TILE
-WORLD_HEIGHT: Final[int] = len(map_array) * TILE
+# Spawn files sit next to the map and list one sprite per line: type, x and y in tiles
+SPAWN_TYPES: Final[Dict[str, int]] = {
+	'barrel': SpriteType.BARREL,
+	'pin': SpriteType.PIN,
+	'devil': SpriteType.DEVIL,
+	'flame': SpriteType.FLAME,
+	'soldier': SpriteType.SOLIDER
+}
 
-# Maps
-world_map: NumbaDict = NumbaDict.empty(key_type=UniTuple(int32, 2), value_type=int32)
-mini_map: Set[Position] = set()
-collision_walls: List[pygame.Rect] = []
 
-# Fill
-for j, row in enumerate(map_array):
-	for i, item in enumerate(row):
-		if item != VOID:
-			mini_map.add((i * MAP_TILE, j * MAP_TILE))
-			collision_walls.append(pygame.Rect(i * TILE, j * TILE, TILE, TILE))
-			world_map[(i * TILE, j * TILE)] = item
+def spawn_file_for(map_file: PathLikeString) -> str:
+	return os.path.splitext(os.fsdecode(map_file))[0] + SPAWN_EXTENSION
+
+
+def load_spawns(spawn_file: PathLikeString) -> np.ndarray:
+	with open(spawn_file, 'r', encoding='utf-8') as file:
+		rows: List[List[str]] = [line.split() for line in file.readlines() if line.strip()]
+
+	return np.array([(SPAWN_TYPES[name], float(x), float(y)) for name, x, y in rows], dtype=SPAWN_DTYPE)
+
+
+# Binary map format: a fixed header, the packed tile array, optional per-tile metadata and a sprite spawn table
+MAP_MAGIC: Final[bytes] = b'DMAP'
+MAP_VERSION: Final[int] = 2
+MAP_HEADER: Final[struct.Struct] = struct.Struct('<4sHHIIQQQI20x')
+MAP_METADATA: Final[int] = 1
+SPAWN_DTYPE: Final[np.dtype] = np.dtype([('type', '<i4'), ('x', '<f8'), ('y', '<f8')])
+WORLD_MAP_KEY: Final[UniTuple] = UniTuple(int32, 2)
+
+
+def save_binary_map(map_file: PathLikeString, tiles: np.ndarray, metadata: Optional[np.ndarray] = None,
+                    spawns: Optional[np.ndarray] = None) -> None:
+	height, width = tiles.shape
+	spawns = np.zeros(0, dtype=SPAWN_DTYPE) if spawns is None else spawns.astype(SPAWN_DTYPE)
+	tiles_offset: int = MAP_HEADER.size
+	metadata_offset: int = tiles_offset + tiles.size if metadata is not None else 0
+	spawns_offset: int = tiles_offset + tiles.size + (metadata.size if metadata is not None else 0)
+
+	with open(map_file, 'wb') as file:
+		file.write(MAP_HEADER.pack(MAP_MAGIC, MAP_VERSION, MAP_METADATA if metadata is not None else 0, width, height,
+		                           tiles_offset, metadata_offset, spawns_offset, len(spawns)))
+		file.write(np.ascontiguousarray(tiles, dtype=np.int8).tobytes())
+
+		if metadata is not None:
+			file.write(np.ascontiguousarray(metadata, dtype=np.uint8).tobytes())
+
+		file.write(spawns.tobytes())
+
+
+def load_binary_map(map_file: PathLikeString) -> Tuple[np.ndarray, Optional[np.ndarray], np.ndarray]:
+	with open(map_file, 'rb') as file:
+		magic, version, flags, width, height, tiles_offset, metadata_offset, spawns_offset, spawn_count = \
+			MAP_HEADER.unpack(file.read(MAP_HEADER.size))
+
+	if magic != MAP_MAGIC or version != MAP_VERSION:
+		raise ValueError(f'{map_file} is not a version {MAP_VERSION} binary map')
+
+	# Copy-on-write mappings, the tiles are paged in on access instead of parsed
+	tiles: np.ndarray = np.memmap(map_file, dtype=np.int8, mode='c', offset=tiles_offset, shape=(height, width))
+	metadata: Optional[np.ndarray] = (np.memmap(map_file, dtype=np.uint8, mode='c', offset=metadata_offset,
+	                                            shape=(height, width)) if flags & MAP_METADATA else None)
+	spawns: np.ndarray = (np.fromfile(map_file, dtype=SPAWN_DTYPE, count=spawn_count, offset=spawns_offset)
+	                      if spawn_count else np.zeros(0, dtype=SPAWN_DTYPE))
+
+	return tiles, metadata, spawns
+
+
+def is_binary_map(map_file: PathLikeString) -> bool:
+	with open(map_file, 'rb') as file:
+		return file.read(len(MAP_MAGIC)) == MAP_MAGIC
+
+
+def convert_map(text_file: PathLikeString, binary_file: PathLikeString) -> None:
+	spawn_file: str = spawn_file_for(text_file)
+	spawns: Optional[np.ndarray] = load_spawns(spawn_file) if os.path.exists(spawn_file) else None
+	save_binary_map(binary_file, np.array(load_map(text_file), dtype=np.int8), spawns=spawns)
+
+
+@njit(cache=True)
+def build_world_map(_tile_grid: np.ndarray) -> NumbaDict:
+	_world_map: NumbaDict = NumbaDict.empty(key_type=WORLD_MAP_KEY, value_type=int32)
+	rows, columns = _tile_grid.shape
+
+	for j in range(rows):
+		for i in range(columns):
+			if _tile_grid[j, i] != VOID:
+				_world_map[(np.int32(i * TILE), np.int32(j * TILE))] = np.int32(_tile_grid[j, i])
+
+	return _world_map
+
+
+class ChunkStreamer:
+	def __init__(self, grid: np.ndarray, chunk: int = WORLD_CHUNK, radius: int = WORLD_CHUNK_RADIUS,
+	             cache_chunks: int = WORLD_CHUNK_CACHE) -> None:
+		self.grid = grid
+		self.chunk_size = chunk
+		self.radius = radius
+		self.cache_chunks = max(cache_chunks, (2 * radius + 1) ** 2)
+		self.chunks: OrderedDict[Position, np.ndarray] = OrderedDict()
+		self.empty_chunk: np.ndarray = np.zeros((chunk, chunk), dtype=np.int8)
+		self.window: np.ndarray = np.zeros(((2 * radius + 1) * chunk,) * 2, dtype=np.int8)
+		self.center: Optional[Position] = None
+		self._world_map: Optional[NumbaDict] = None
+
+		# Statistics
+		self.loads = 0
+		self.evictions = 0
+
+	@property
+	def reach(self) -> int:
+		# Every point within this distance of the player is inside the window
+		return self.radius * self.chunk_size * TILE
+
+	@property
+	def origin(self) -> Position:
+		return ((self.center[0] - self.radius) * self.chunk_size * TILE,
+		        (self.center[1] - self.radius) * self.chunk_size * TILE)
+
+	def chunk(self, chunk_x: int, chunk_y: int) -> np.ndarray:
+		rows, columns = self.grid.shape
+		size: int = self.chunk_size
+
+		if not (0 <= chunk_x * size < columns and 0 <= chunk_y * size < rows):
+			return self.empty_chunk
+
+		tiles: Optional[np.ndarray] = self.chunks.get((chunk_x, chunk_y))
+
+		if tiles is None:
+			tiles = self.empty_chunk.copy()
+			source: np.ndarray = self.grid[chunk_y * size:(chunk_y + 1) * size, chunk_x * size:(chunk_x + 1) * size]
+			tiles[:source.shape[0], :source.shape[1]] = source
+			self.chunks[chunk_x, chunk_y] = tiles
+			self.loads += 1
+
+			while len(self.chunks) > self.cache_chunks:
+				self.chunks.popitem(last=False)
+				self.evictions += 1
+		else:
+			self.chunks.move_to_end((chunk_x, chunk_y))
+
+		return tiles
+
+	def update(self, x: Number, y: Number) -> bool:
+		center: Position = int(x // TILE) // self.chunk_size, int(y // TILE) // self.chunk_size
+
+		if center == self.center:
+			return False
+
+		# The window is rebuilt from resident chunks only when the player enters another chunk
+		self.center = center
+		size: int = self.chunk_size
+
+		for j in range(2 * self.radius + 1):
+			for i in range(2 * self.radius + 1):
+				self.window[j * size:(j + 1) * size, i * size:(i + 1) * size] = self.chunk(
+					center[0] - self.radius + i, center[1] - self.radius + j
+				)
+
+		self._world_map = None
+		return True
+
+	# Only the legacy dict ray caster needs the dictionary, so it is built on first use
+	@property
+	def world_map(self) -> NumbaDict:
+		if self._world_map is None:
+			self._world_map = build_world_map(self.window)
+
+		return self._world_map
+
+	@property
+	def stats(self) -> Dict[str, Number]:
+		return {
+			'resident_chunks': len(self.chunks),
+			'resident_bytes': len(self.chunks) * self.empty_chunk.nbytes + self.window.nbytes,
+			'loads': self.loads,
+			'evictions': self.evictions
+		}
+
+
+class Level:
+	def __init__(self) -> None:
+		self.map_file: Optional[PathLikeString] = None
+		self.tile_grid: np.ndarray = np.zeros((0, 0), dtype=np.int8)
+		self.metadata: Optional[np.ndarray] = None
+		self.spawns: np.ndarray = np.zeros(0, dtype=SPAWN_DTYPE)
+		self.streamer: ChunkStreamer = ChunkStreamer(self.tile_grid)
+
+	def load(self, map_file: PathLikeString = MAP_FILE, spawn_file: Optional[PathLikeString] = None) -> None:
+		if is_binary_map(map_file):
+			self.tile_grid, self.metadata, self.spawns = load_binary_map(map_file)
+		else:
+			self.tile_grid = np.array(load_map(map_file), dtype=np.int8)
+			self.metadata, self.spawns = None, np.zeros(0, dtype=SPAWN_DTYPE)
+
+		# A spawn file next to the map, or one given explicitly, replaces the embedded spawn table
+		spawn_file = spawn_file if spawn_file is not None else spawn_file_for(map_file)
+
+		if os.path.exists(spawn_file):
+			self.spawns = load_spawns(spawn_file)
+
+		self.map_file = map_file
+		self.streamer = ChunkStreamer(self.tile_grid)
+
+	@property
+	def placements(self) -> List[Tuple[int, Position]]:
+		return [(sprite_type, (x, y)) for sprite_type, x, y in self.spawns.tolist()]
+
+
+level: Level = Level()
+
+
+# Spatial index for collision queries
+class CollisionGrid:
+	def __init__(self, grid: np.ndarray, sprites: List['Sprite']) -> None:  # NOQA
+		self.grid = grid
+		self.sprites: Dict[Position, List['Sprite']] = defaultdict(list)  # NOQA
+		self.sprite_cells: Dict[int, Position] = {}
+
+		for sprite in sprites:
+			self.add(sprite)
+
+	@staticmethod
+	def cell(x: Number, y: Number) -> Position:
+		return int(x // TILE), int(y // TILE)
+
+	def add(self, sprite: 'Sprite') -> None:  # NOQA
+		cell: Position = self.cell(sprite.x, sprite.y)
+		self.sprites[cell].append(sprite)
+		self.sprite_cells[id(sprite)] = cell
+
+	def update(self, sprite: 'Sprite') -> None:  # NOQA
+		cell: Position = self.cell(sprite.x, sprite.y)
+		old_cell: Position = self.sprite_cells[id(sprite)]
+
+		if cell != old_cell:
+			self.sprites[old_cell].remove(sprite)
+			self.sprites[cell].append(sprite)
+			self.sprite_cells[id(sprite)] = cell
+
+	def query(self, rect: pygame.Rect) -> List[pygame.Rect]:
+		x1, y1 = self.cell(rect.left, rect.top)
+		x2, y2 = self.cell(rect.right, rect.bottom)
+		rows, columns = self.grid.shape
+		rects: List[pygame.Rect] = [pygame.Rect(i * TILE, j * TILE, TILE, TILE)
+		                            for j in range(max(y1, 0), min(y2, rows - 1) + 1)
+		                            for i in range(max(x1, 0), min(x2, columns - 1) + 1) if self.grid[j, i] != VOID]
+
+		# Sprites are bucketed by their center, so their rects can reach into the next cell
+		for j in range(y1 - 1, y2 + 2):
+			for i in range(x1 - 1, x2 + 2):
+				for sprite in self.sprites.get((i, j), ()):
+					if sprite.is_blocked:
+						rects.append(pygame.Rect(*sprite.position, sprite.side, sprite.side))
+
+		return rects
+
+
+def main() -> None:
+	parser: ArgumentParser = ArgumentParser(description='Convert a text map to the binary map format')
+	parser.add_argument('source', help='text map file')
+	parser.add_argument('destination', help='binary map file')
+	arguments: Namespace = parser.parse_args()
+
+	convert_map(arguments.source, arguments.destination)
+
+
+if __name__ == '__main__':
+	main()
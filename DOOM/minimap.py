@@ -0,0 +1,107 @@
+from math import sin, cos, degrees
+from typing import Dict, Hashable
+
+import numpy as np
+import pygame
+
+from caches import SurfaceCache
+from map import level
+from player import Player
+from utilities import *
+
+
+class MiniMap:
+	def __init__(self, grid: Optional[np.ndarray] = None, zoom: int = MINIMAP_ZOOM) -> None:
+		self.grid = grid if grid is not None else level.tile_grid
+		self.zoom = zoom
+		self.chunks = SurfaceCache(MINIMAP_CACHE_MEMORY)
+
+	@property
+	def tile_size(self) -> int:
+		return MINIMAP_ZOOM_LEVELS[self.zoom]
+
+	def set_zoom(self, zoom: int) -> None:
+		self.zoom = zoom % len(MINIMAP_ZOOM_LEVELS)
+
+	def invalidate(self, grid: Optional[np.ndarray] = None) -> None:
+		if grid is not None:
+			self.grid = grid
+
+		self.chunks.clear()
+
+	def chunk(self, chunk_x: int, chunk_y: int) -> Surface:
+		key: Tuple[int, int, int] = self.tile_size, chunk_x, chunk_y
+		surface: Optional[Surface] = self.chunks.get(key)
+
+		if surface is None:
+			tile_size: int = self.tile_size
+			surface = Surface((MINIMAP_CHUNK * tile_size, MINIMAP_CHUNK * tile_size))
+			surface.fill(BLACK)
+			tiles: np.ndarray = self.grid[chunk_y * MINIMAP_CHUNK:(chunk_y + 1) * MINIMAP_CHUNK,
+			                              chunk_x * MINIMAP_CHUNK:(chunk_x + 1) * MINIMAP_CHUNK]
+
+			for j, i in np.argwhere(tiles != VOID):
+				pygame.draw.rect(surface, DARK_BROWN, (i * tile_size, j * tile_size, tile_size, tile_size))
+
+			surface = self.chunks.put(key, surface)
+
+		return surface
+
+	def viewport(self, player: Player) -> Position:
+		tile_size: int = self.tile_size
+		rows, columns = self.grid.shape
+		width, height = MINIMAP_RESOLUTION
+		x: int = int(player.x * tile_size / TILE) - width // 2
+		y: int = int(player.y * tile_size / TILE) - height // 2
+
+		return max(0, min(x, columns * tile_size - width)), max(0, min(y, rows * tile_size - height))
+
+	def markers(self, player: Player) -> List[Position]:
+		tile_size: int = self.tile_size
+		width, height = MINIMAP_RESOLUTION
+		view_x, view_y = self.viewport(player)
+		markers: List[Position] = []
+
+		for sprite in player.sprites.list_of_objects:
+			if sprite.flag == Flag.NPC and not sprite.is_dead:
+				sprite_x: int = int(sprite.x * tile_size / TILE) - view_x
+				sprite_y: int = int(sprite.y * tile_size / TILE) - view_y
+
+				if 0 <= sprite_x < width and 0 <= sprite_y < height:
+					markers.append((sprite_x, sprite_y))
+
+		return markers
+
+	def state(self, player: Player) -> Hashable:
+		# Everything the minimap shows, in whole minimap pixels and degrees
+		tile_size: int = self.tile_size
+		return (tile_size, int(player.x * tile_size / TILE), int(player.y * tile_size / TILE),
+		        round(degrees(player.angle)) % 360, tuple(self.markers(player)))
+
+	def draw(self, screen_map: Surface, player: Player) -> None:
+		screen_map.fill(BLACK)
+		tile_size: int = self.tile_size
+		chunk_size: int = MINIMAP_CHUNK * tile_size
+		rows, columns = self.grid.shape
+		width, height = MINIMAP_RESOLUTION
+		view_x, view_y = self.viewport(player)
+
+		# Static layer
+		for chunk_y in range(view_y // chunk_size, min((view_y + height) // chunk_size + 1,
+		                                               (rows - 1) // MINIMAP_CHUNK + 1)):
+			for chunk_x in range(view_x // chunk_size, min((view_x + width) // chunk_size + 1,
+			                                               (columns - 1) // MINIMAP_CHUNK + 1)):
+				screen_map.blit(self.chunk(chunk_x, chunk_y), (chunk_x * chunk_size - view_x, chunk_y * chunk_size - view_y))
+
+		# Dynamic layer
+		for marker in self.markers(player):
+			pygame.draw.circle(screen_map, DARK_ORANGE, marker, 3)
+
+		map_x, map_y = player.x * tile_size / TILE - view_x, player.y * tile_size / TILE - view_y
+		pygame.draw.line(screen_map, YELLOW, (map_x, map_y),
+		                 (map_x + 12 * cos(player.angle), map_y + 12 * sin(player.angle)), 3)
+		pygame.draw.circle(screen_map, RED, (map_x, map_y), 5)
+
+	@property
+	def stats(self) -> Dict[str, Number]:
+		return self.chunks.stats
@@ -0,0 +1,111 @@
+from time import perf_counter
+from typing import Dict
+
+import numpy as np
+from numba import njit
+
+from map import level, ChunkStreamer
+from utilities import *
+
+# Neighbour offsets (dx, dy), orthogonal first so that straight steps win ties
+DIRECTIONS: Final[np.ndarray] = np.array([(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)],
+                                         dtype=np.int64)
+NO_DIRECTION: Final[int] = -1
+
+
+@njit(cache=True)
+def flow_field(_tile_grid: np.ndarray, start_x: int, start_y: int, radius: int,
+               distances: np.ndarray, directions: np.ndarray) -> int:
+	rows, columns = _tile_grid.shape
+	distances[:] = -1
+	directions[:] = NO_DIRECTION
+
+	if not (0 <= start_x < columns and 0 <= start_y < rows):
+		return 0
+
+	queue: np.ndarray = np.empty(rows * columns, dtype=np.int64)
+	queue[0] = start_y * columns + start_x
+	distances[start_y, start_x] = 0
+	head, tail = 0, 1
+
+	# Breadth-first search from the target, every reached tile remembers the step back towards it
+	while head < tail:
+		y, x = divmod(queue[head], columns)
+		head += 1
+		distance: int = distances[y, x]
+
+		if distance >= radius:
+			continue
+
+		for i in range(len(DIRECTIONS)):
+			dx, dy = DIRECTIONS[i, 0], DIRECTIONS[i, 1]
+			nx, ny = x + dx, y + dy
+
+			if not (0 <= nx < columns and 0 <= ny < rows) or distances[ny, nx] != -1 or _tile_grid[ny, nx] != VOID:
+				continue
+
+			# Diagonal steps must not cut wall corners
+			if dx and dy and (_tile_grid[y, nx] != VOID or _tile_grid[ny, x] != VOID):
+				continue
+
+			distances[ny, nx] = distance + 1
+			directions[ny, nx] = i ^ 1 if i < 4 else 11 - i
+			queue[tail] = ny * columns + nx
+			tail += 1
+
+	return tail
+
+
+class FlowField:
+	def __init__(self, player: 'Player', radius: int = FLOW_FIELD_RADIUS) -> None:  # NOQA
+		self.player = player
+		self.radius = radius
+		self.key: Optional[Tuple[Position, Position]] = None
+		self.origin: Position = 0, 0
+		self.distances: np.ndarray = np.empty((0, 0), dtype=np.int32)
+		self.directions: np.ndarray = np.empty((0, 0), dtype=np.int8)
+
+		# Statistics
+		self.builds = 0
+		self.visited = 0
+		self.build_time = 0.0
+
+	def update(self) -> bool:
+		streamer: ChunkStreamer = level.streamer
+		streamer.update(*self.player.position)
+		origin_x, origin_y = streamer.origin[0] // TILE, streamer.origin[1] // TILE
+		player_tile: Position = int(self.player.x // TILE), int(self.player.y // TILE)
+
+		# One search per tile the player enters, every NPC then reads its step from the field
+		if (player_tile, (origin_x, origin_y)) == self.key:
+			return False
+
+		start: float = perf_counter()
+		self.key = player_tile, (origin_x, origin_y)
+		self.origin = origin_x, origin_y
+
+		if self.distances.shape != streamer.window.shape:
+			self.distances = np.empty(streamer.window.shape, dtype=np.int32)
+			self.directions = np.empty(streamer.window.shape, dtype=np.int8)
+
+		self.visited += flow_field(streamer.window, player_tile[0] - origin_x, player_tile[1] - origin_y, self.radius,
+		                           self.distances, self.directions)
+		self.builds += 1
+		self.build_time += perf_counter() - start
+		return True
+
+	def step(self, x: float, y: float) -> Optional[Position]:
+		tile_x, tile_y = int(x // TILE) - self.origin[0], int(y // TILE) - self.origin[1]
+		rows, columns = self.directions.shape
+
+		if not (0 <= tile_x < columns and 0 <= tile_y < rows) or self.directions[tile_y, tile_x] == NO_DIRECTION:
+			return None
+
+		# Centre of the next tile on the way to the player
+		dx, dy = DIRECTIONS[self.directions[tile_y, tile_x]]
+		return ((tile_x + self.origin[0] + dx) * TILE + TILE // 2,
+		        (tile_y + self.origin[1] + dy) * TILE + TILE // 2)
+
+	@property
+	def stats(self) -> Dict[str, Number]:
+		return {'builds': self.builds, 'visited': self.visited, 'build_time': self.build_time}
@@ -1,38 +1,60 @@
+from contextlib import contextmanager
 from math import sin, cos
+from typing import Iterator
 
-import pygame
 from pygame import Rect
 
-from map import collision_walls
+from controls import Action, Controls, LiveInput, TickInput
+from map import level, CollisionGrid
 from utilities import *
 
 
 class Player:
-	def __init__(self, sprites: 'Sprites') -> None:  # NOQA
+	def __init__(self, sprites: 'Sprites', controls: Optional[Controls] = None) -> None:  # NOQA
 		self.x, self.y = PLAYER_POSITION
 		self.angle = PLAYER_ANGLE
 		self.rect = Rect(*PLAYER_POSITION, PLAYER_SIDE, PLAYER_SIDE)
 		self.sprites = sprites
+		self.collision_grid = CollisionGrid(level.tile_grid, sprites.list_of_objects)
 		self.shot = False
+		self.minimap_zoom = MINIMAP_ZOOM
+		self.previous: Tuple[float, float, float] = self.x, self.y, self.angle
+		self.controls = controls if controls is not None else LiveInput()
+		self.input: TickInput = TickInput()
 
 	@property
 	def position(self) -> Position:
 		return int(self.x), int(self.y)
 
-	@property
-	def collision_list(self) -> List[Rect]:
-		return collision_walls + [Rect(*sprite.position, sprite.side, sprite.side)
-		                          for sprite in self.sprites.list_of_objects if sprite.is_blocked]
+	def snapshot(self) -> None:
+		self.previous = self.x, self.y, self.angle
+
+	@contextmanager
+	def interpolated(self, alpha: float) -> Iterator[None]:
+		current: Tuple[float, float, float] = self.x, self.y, self.angle
+		x, y, angle = self.previous
+
+		# Shortest way around the circle, the angle wraps at every tick
+		turn: float = (current[2] - angle + pi) % DOUBLE_PI - pi
+		self.x, self.y = x + (current[0] - x) * alpha, y + (current[1] - y) * alpha
+		self.angle = (angle + turn * alpha) % DOUBLE_PI
+
+		try:
+			yield
+		finally:
+			self.x, self.y, self.angle = current
 
 	def detect_collision(self, dx: float, dy: float) -> None:
 		next_rect: Rect = self.rect.copy()
 		next_rect.move_ip(dx, dy)
 
-		if len(hit_indices := next_rect.collidelistall(self.collision_list)):
+		collision_list: List[Rect] = self.collision_grid.query(next_rect)
+
+		if len(hit_indices := next_rect.collidelistall(collision_list)):
 			delta_x = delta_y = 0
 
 			for hit_index in hit_indices:
-				hit_rect = self.collision_list[hit_index]
+				hit_rect = collision_list[hit_index]
 
 				if dx > 0:
 					delta_x += next_rect.right - hit_rect.left
@@ -54,6 +76,13 @@ class Player:
 		self.x += dx
 		self.y += dy
 
+	def poll(self) -> None:
+		# Read before anything else in the tick, so a quit leaves the game state of the previous tick
+		self.input = self.controls.poll()
+
+		if Action.QUIT in self.input:
+			exit()
+
 	def move(self) -> None:
 		self.key_control()
 		self.mouse_control()
@@ -62,55 +91,42 @@ class Player:
 
 	def key_control(self) -> None:
 		sin_a, cos_a = sin(self.angle), cos(self.angle)
-		keys: pygame.key.ScancodeWrapper = pygame.key.get_pressed()
-
-		# Exit
-		if keys[pygame.K_ESCAPE]:
-			exit()
 
 		# Move
-		if keys[pygame.K_w]:  # Forward
+		if Action.FORWARD in self.input:
 			dx = PLAYER_SPEED * cos_a
 			dy = PLAYER_SPEED * sin_a
 			self.detect_collision(dx, dy)
 
-		if keys[pygame.K_s]:  # Backward
+		if Action.BACKWARD in self.input:
 			dx = -PLAYER_SPEED * cos_a
 			dy = -PLAYER_SPEED * sin_a
 			self.detect_collision(dx, dy)
 
-		if keys[pygame.K_a]:  # Left
+		if Action.LEFT in self.input:
 			dx = PLAYER_SPEED * sin_a
 			dy = -PLAYER_SPEED * cos_a
 			self.detect_collision(dx, dy)
 
-		if keys[pygame.K_d]:  # Right
+		if Action.RIGHT in self.input:
 			dx = -PLAYER_SPEED * sin_a
 			dy = PLAYER_SPEED * cos_a
 			self.detect_collision(dx, dy)
 
 		# Shoot
-		if keys[pygame.K_e] and not self.shot:
+		if Action.SHOOT in self.input and not self.shot:
 			self.shot = True
 
 		# Rotate
-		if keys[pygame.K_LEFT]:  # Left
+		if Action.TURN_LEFT in self.input:
 			self.angle -= PLAYER_ROTATION_SPEED
 
-		if keys[pygame.K_RIGHT]:  # Right
+		if Action.TURN_RIGHT in self.input:
 			self.angle += PLAYER_ROTATION_SPEED
 
 		# Other
-		for event in pygame.event.get():
-			if event.type == pygame.QUIT:
-				exit()
-
-			if event.type == pygame.MOUSEBUTTONDOWN:
-				if event.button == 1 and not self.shot:
-					self.shot = True
+		if Action.ZOOM in self.input:
+			self.minimap_zoom += 1
 
 	def mouse_control(self) -> None:
-		if pygame.mouse.get_focused():
-			difference: int = pygame.mouse.get_pos()[0] - HALF_WIDTH
-			pygame.mouse.set_pos((HALF_WIDTH, HALF_HEIGHT))
-			self.angle += difference * PLAYER_MOUSE_SENSITIVITY / 100000
+		self.angle += self.input.mouse * PLAYER_MOUSE_SENSITIVITY / 100000
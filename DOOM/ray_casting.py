@@ -1,34 +1,38 @@
 from math import sin, cos
 
+import numpy as np
 import pygame
-from numba import njit
+from numba import njit, prange, set_num_threads, config
 from numba.typed.typeddict import Dict as NumbaDict
 
-from map import world_map, WORLD_WIDTH, WORLD_HEIGHT
+from caches import WallColumnCache
+from map import level, ChunkStreamer
 from player import Player
+from render_config import RenderConfig, render_config
 from utilities import *
 
 
-@njit(fastmath=True)
+@njit(fastmath=True, cache=True)
 def mapping(a: float, b: float) -> Position:
 	return (a // TILE) * TILE, (b // TILE) * TILE
 
 
-@njit(fastmath=True)
-def ray_casting(player_position: Position, player_angle: float, _world_map: NumbaDict) -> CastedWalls:
+@njit(fastmath=True, cache=True)
+def ray_casting(player_position: Position, player_angle: float, _world_map: NumbaDict, number_rays: int,
+                delta_angle: float, world_width: int, world_height: int, max_depth: float) -> CastedWalls:
 	casted_walls: CastedWalls = []
 	ox, oy = player_position
 	xm, ym = mapping(ox, oy)
 	texture_v = texture_h = WALL1
 	current_angle: float = player_angle - HALF_FOV
 
-	for ray in range(NUMBER_RAYS):
+	for ray in range(number_rays):
 		sin_a, cos_a = sin(current_angle), cos(current_angle)
 
 		# Verticals
 		x, dx = (xm + TILE, 1) if cos_a >= 0 else (xm, -1)
 
-		for i in range(0, WORLD_WIDTH, TILE):
+		for i in range(0, min(world_width, int(max_depth) + TILE), TILE):
 			depth_v: float = (x - ox) / cos_a
 			yv: float = oy + depth_v * sin_a
 			tile_v: Position = mapping(x + dx, yv)
@@ -42,7 +46,7 @@ def ray_casting(player_position: Position, player_angle: float, _world_map: Numb
 		# Horizontals
 		y, dy = (ym + TILE, 1) if sin_a >= 0 else (ym, -1)
 
-		for i in range(0, WORLD_HEIGHT, TILE):
+		for i in range(0, min(world_height, int(max_depth) + TILE), TILE):
 			depth_h: float = (y - oy) / sin_a
 			xh: float = ox + depth_h * cos_a
 			tile_h: Position = mapping(xh, y + dy)
@@ -55,37 +59,203 @@ def ray_casting(player_position: Position, player_angle: float, _world_map: Numb
 
 		# Projection
 		depth, offset, texture = (depth_v, yv, texture_v) if depth_v < depth_h else (depth_h, xh, texture_h)  # NOQA
+
+		if depth >= max_depth:
+			depth, texture = max_depth, VOID
+
 		offset = int(offset) % TILE
 		depth *= cos(player_angle - current_angle)
 		depth = max(depth, 0.00001)
 		projection_height = int(PROJECTION_COEFFICIENT / depth)
 		casted_walls.append((depth, offset, projection_height, texture))
 
-		current_angle += DELTA_ANGLE
+		current_angle += delta_angle
+
+	return casted_walls
+
+
+@njit(fastmath=True, cache=True)
+def cast_ray(ox: float, oy: float, player_angle: float, current_angle: float, _tile_grid: np.ndarray,
+             max_depth: float) -> Tuple[float, int, int, int]:
+	rows, columns = _tile_grid.shape
+	sin_a, cos_a = sin(current_angle), cos(current_angle)
+	sin_a = sin_a if sin_a else 0.000001
+	cos_a = cos_a if cos_a else 0.000001
+	tile_x, tile_y = int(ox // TILE), int(oy // TILE)
+
+	# Distances to the first vertical and horizontal grid lines
+	step_x, depth_v = (1, ((tile_x + 1) * TILE - ox) / cos_a) if cos_a >= 0 else (-1, (tile_x * TILE - ox) / cos_a)
+	step_y, depth_h = (1, ((tile_y + 1) * TILE - oy) / sin_a) if sin_a >= 0 else (-1, (tile_y * TILE - oy) / sin_a)
+	delta_v, delta_h = abs(TILE / cos_a), abs(TILE / sin_a)
+
+	# Walk the grid until the first wall or the maximum distance, cut off rays come back as VOID
+	depth: float = 0.0
+	texture: int = WALL1
+	vertical: bool = True
+
+	while True:
+		if depth_v < depth_h:
+			tile_x += step_x
+			depth, vertical = depth_v, True
+			depth_v += delta_v
+		else:
+			tile_y += step_y
+			depth, vertical = depth_h, False
+			depth_h += delta_h
+
+		if depth >= max_depth or not (0 <= tile_x < columns and 0 <= tile_y < rows):
+			depth, texture = min(depth, max_depth), VOID
+			break
+
+		if _tile_grid[tile_y, tile_x] != VOID:
+			texture = int(_tile_grid[tile_y, tile_x])
+			break
+
+	# Projection
+	offset = oy + depth * sin_a if vertical else ox + depth * cos_a
+	offset = int(offset) % TILE
+	depth *= cos(player_angle - current_angle)
+	depth = max(depth, 0.00001)
+	projection_height = int(PROJECTION_COEFFICIENT / depth)
+
+	return depth, offset, projection_height, texture
+
+
+@njit(fastmath=True, cache=True)
+def ray_casting_grid(player_position: Position, player_angle: float, _tile_grid: np.ndarray, number_rays: int,
+                     delta_angle: float, max_depth: float) -> CastedWalls:
+	casted_walls: CastedWalls = []
+	ox, oy = player_position
+
+	for ray in range(number_rays):
+		casted_walls.append(cast_ray(ox, oy, player_angle, player_angle - HALF_FOV + ray * delta_angle, _tile_grid,
+		                             max_depth))
+
+	return casted_walls
+
+
+@njit(fastmath=True, parallel=True, cache=True)
+def ray_casting_parallel(player_position: Position, player_angle: float, _tile_grid: np.ndarray, number_rays: int,
+                         delta_angle: float, max_depth: float) -> CastedWalls:
+	ox, oy = player_position
+	depths: np.ndarray = np.empty(number_rays)
+	offsets: np.ndarray = np.empty(number_rays, dtype=np.int64)
+	projection_heights: np.ndarray = np.empty(number_rays, dtype=np.int64)
+	textures: np.ndarray = np.empty(number_rays, dtype=np.int64)
+
+	for ray in prange(number_rays):
+		depths[ray], offsets[ray], projection_heights[ray], textures[ray] = cast_ray(
+			ox, oy, player_angle, player_angle - HALF_FOV + ray * delta_angle, _tile_grid, max_depth
+		)
+
+	casted_walls: CastedWalls = []
+
+	for ray in range(number_rays):
+		casted_walls.append((depths[ray], offsets[ray], projection_heights[ray], textures[ray]))
 
 	return casted_walls
 
 
-def ray_casting_walls(player: Player, textures: Surfaces) -> Tuple[Walls, Position]:
-	casted_walls: CastedWalls = ray_casting(player.position, player.angle, world_map)
-	wall_shot: Position = casted_walls[CENTER_RAY][0], casted_walls[CENTER_RAY][2]
+@njit(fastmath=True, parallel=True, cache=True)
+def cast_floor(pixels: np.ndarray, textures: np.ndarray, row_distances: np.ndarray, row_levels: np.ndarray,
+               directions_x: np.ndarray, directions_y: np.ndarray, ox: float, oy: float, step: int) -> None:
+	width: int = pixels.shape[0]
+	mask: int = textures.shape[1] - 1
+	texels: float = textures.shape[1] / TILE
+
+	# Every screen row below the horizon is one distance, every column one direction, so each pixel is a lookup
+	for row in prange(len(row_distances)):
+		distance: float = row_distances[row]
+		texture: np.ndarray = textures[row_levels[row]]
+		y: int = HALF_HEIGHT + row
+
+		for x in range(0, width, step):
+			sample: int = min(x + step // 2, width - 1)
+			texture_x: int = int((ox + distance * directions_x[sample]) * texels) & mask
+			texture_y: int = int((oy + distance * directions_y[sample]) * texels) & mask
+			color = texture[texture_x, texture_y]
+
+			for column in range(x, min(x + step, width)):
+				pixels[column, y] = color
+
+
+def set_ray_casting_threads(threads: int = RAY_CASTING_THREADS) -> None:
+	if threads > 0:
+		set_num_threads(min(threads, config.NUMBA_NUM_THREADS))
+
+
+def cast_walls(player_position: Position, player_angle: float, engine: int = RAY_CASTING_ENGINE,
+               render: RenderConfig = render_config) -> CastedWalls:
+	# Rays only walk the window of chunks around the player, in window coordinates
+	streamer: ChunkStreamer = level.streamer
+	streamer.update(*player_position)
+	origin_x, origin_y = streamer.origin
+	position: Position = player_position[0] - origin_x, player_position[1] - origin_y
+	max_depth: float = float(min(render.max_depth, streamer.reach))
+
+	if engine == RayCastingEngine.GRID:
+		return ray_casting_grid(position, player_angle, streamer.window, render.number_rays, render.delta_angle,
+		                        max_depth)
+
+	if engine == RayCastingEngine.PARALLEL:
+		return ray_casting_parallel(position, player_angle, streamer.window, render.number_rays, render.delta_angle,
+		                            max_depth)
+
+	rows, columns = streamer.window.shape
+	return ray_casting(position, player_angle, streamer.world_map, render.number_rays, render.delta_angle,
+	                   columns * TILE, rows * TILE, max_depth)
+
+
+def compare_engines(player_position: Position, player_angle: float) -> Tuple[float, int, int, int]:
+	dict_walls: CastedWalls = cast_walls(player_position, player_angle, RayCastingEngine.DICT)
+	grid_walls: CastedWalls = cast_walls(player_position, player_angle, RayCastingEngine.GRID)
+
+	return (
+		max(abs(a[0] - b[0]) for a, b in zip(dict_walls, grid_walls)),
+		sum(a[1] != b[1] for a, b in zip(dict_walls, grid_walls)),
+		max(abs(a[2] - b[2]) for a, b in zip(dict_walls, grid_walls)),
+		sum(a[3] != b[3] for a, b in zip(dict_walls, grid_walls))
+	)
+
+
+def ray_casting_columns(player: Player, engine: int = RAY_CASTING_ENGINE) -> Tuple[CastedWalls, Position]:
+	casted_walls: CastedWalls = cast_walls(player.position, player.angle, engine)
+	center_ray: int = render_config.center_ray
+	return casted_walls, (casted_walls[center_ray][0], casted_walls[center_ray][2])
+
+
+def depth_buffer(casted_walls: CastedWalls) -> np.ndarray:
+	return np.array([casted_values[0] for casted_values in casted_walls])
+
+
+def wall_columns(casted_walls: CastedWalls, textures: Surfaces,
+                 column_cache: Optional[WallColumnCache] = None) -> Walls:
 	walls: Walls = []
+	scale: int = render_config.scale
 
 	for ray, casted_values in enumerate(casted_walls):
 		depth, offset, projection_height, texture = casted_values
 
-		if projection_height > HEIGHT:
+		# Cut off rays have no wall, the fog layer covers them
+		if texture == VOID:
+			continue
+
+		if column_cache is not None:
+			fog_level: int = render_config.fog_level(depth) if WALL_FOG_SHADING else 0
+			wall_column, wall_y = column_cache.column(texture, offset, projection_height, scale, fog_level)
+			wall_position: Position = ray * scale, wall_y
+		elif projection_height > HEIGHT:
 			coefficient: float = projection_height / HEIGHT
 			texture_height: float = TEXTURE_SIZE / coefficient
 			wall_column = textures[texture].subsurface(offset * TEXTURE_SCALE, HALF_TEXTURE_SIZE - texture_height // 2,
 			                                           TEXTURE_SCALE, texture_height)
-			wall_column = pygame.transform.scale(wall_column, (SCALE, HEIGHT))
-			wall_position: Position = ray * SCALE, 0
+			wall_column = pygame.transform.scale(wall_column, (scale, HEIGHT))
+			wall_position: Position = ray * scale, 0
 		else:
 			wall_column: Surface = textures[texture].subsurface(offset * TEXTURE_SCALE, 0, TEXTURE_SCALE, TEXTURE_SIZE)
-			wall_column = pygame.transform.scale(wall_column, (SCALE, projection_height))
-			wall_position: Position = ray * SCALE, HALF_HEIGHT - projection_height // 2
+			wall_column = pygame.transform.scale(wall_column, (scale, projection_height))
+			wall_position: Position = ray * scale, HALF_HEIGHT - projection_height // 2
 
 		walls.append((depth, wall_column, wall_position))
 
-	return walls, wall_shot
+	return walls
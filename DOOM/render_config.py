@@ -0,0 +1,74 @@
+from collections import deque
+
+from utilities import *
+
+
+class RenderConfig:
+	def __init__(self, number_rays: int = NUMBER_RAYS, max_depth: float = MAX_DRAW_DISTANCE) -> None:
+		self.set_number_rays(number_rays)
+		self.set_max_depth(max_depth)
+
+	def set_number_rays(self, number_rays: int) -> None:
+		# Every ray owns a column of the same width, a remainder would leave the right side of the view undrawn
+		if number_rays <= 0 or WIDTH % number_rays:
+			raise ValueError(f'{number_rays} rays do not divide the width of {WIDTH}')
+
+		self.number_rays = number_rays
+		self.scale = WIDTH // number_rays
+		self.delta_angle = FOV / number_rays
+		self.center_ray = number_rays // 2 - 1
+		self.fake_rays = FAKE_RAYS * number_rays // NUMBER_RAYS
+		self.fake_rays_range = number_rays - 1 + 2 * self.fake_rays
+
+		# Wall and sprite heights are screen-space, so they do not depend on the ray count
+		self.projection_coefficient = PROJECTION_COEFFICIENT
+
+	def set_max_depth(self, max_depth: float) -> None:
+		self.max_depth = max_depth
+		self.fog_start = max_depth * FOG_START
+
+	def fog_level(self, depth: float) -> int:
+		return min(max(int((depth - self.fog_start) * FOG_LEVELS / max(self.max_depth - self.fog_start, 1)), 0),
+		           FOG_LEVELS)
+
+
+class FrameGovernor:
+	def __init__(self, config: RenderConfig, target_fps: int = FPS, levels: Tuple[int, ...] = RENDER_RAY_LEVELS,
+	             window: int = GOVERNOR_WINDOW) -> None:
+		self.config = config
+		self.budget = 1000 / target_fps
+		self.levels = levels
+		self.level = min(range(len(levels)), key=lambda i: abs(levels[i] - config.number_rays))
+		self.frame_times: Deque[float] = deque(maxlen=window)
+
+	def update(self, frame_time: float) -> bool:
+		self.frame_times.append(frame_time)
+
+		# Wait for a full window after every change so the new level is measured on its own frames
+		if len(self.frame_times) < self.frame_times.maxlen:
+			return False
+
+		average: float = sum(self.frame_times) / len(self.frame_times)
+
+		if average > self.budget * GOVERNOR_DOWNGRADE and self.level > 0:
+			self.level -= 1
+		elif average < self.budget * GOVERNOR_UPGRADE and self.level < len(self.levels) - 1:
+			self.level += 1
+		else:
+			return False
+
+		self.config.set_number_rays(self.levels[self.level])
+		self.frame_times.clear()
+		return True
+
+
+def number_rays(value: str) -> int:
+	rays: int = int(value)
+
+	if rays <= 0 or WIDTH % rays:
+		raise ValueError(value)
+
+	return rays
+
+
+render_config: RenderConfig = RenderConfig()
@@ -0,0 +1,88 @@
+import hashlib
+import struct
+from bisect import bisect_right
+from math import hypot
+from typing import Dict
+
+from utilities import *
+
+
+class FixedTimestep:
+	def __init__(self, tick_rate: int = TICK_RATE, max_ticks: int = MAX_TICKS_PER_FRAME) -> None:
+		self.tick_time = 1 / tick_rate
+		self.max_ticks = max_ticks
+		self.accumulator = 0.0
+		self.tick = 0
+
+		# Statistics
+		self.dropped = 0
+
+	def advance(self, frame_time: float) -> range:
+		self.accumulator += frame_time
+		ticks: int = int(self.accumulator // self.tick_time)
+		self.accumulator -= ticks * self.tick_time
+
+		# A frame that took too long slows the game down instead of piling up ticks for the next frames
+		if ticks > self.max_ticks:
+			self.dropped += ticks - self.max_ticks
+			ticks = self.max_ticks
+
+		self.tick += ticks
+		return range(self.tick - ticks, self.tick)
+
+	@property
+	def alpha(self) -> float:
+		return self.accumulator / self.tick_time
+
+	@property
+	def stats(self) -> Dict[str, Number]:
+		return {'ticks': self.tick, 'dropped': self.dropped}
+
+
+class NpcScheduler:
+	def __init__(self, player: 'Player', distances: Tuple[int, ...] = NPC_LOD_DISTANCES,  # NOQA
+	             intervals: Tuple[int, ...] = NPC_LOD_INTERVALS,
+	             hidden_interval: int = NPC_LOD_HIDDEN_INTERVAL) -> None:
+		self.player = player
+		self.distances = distances
+		self.intervals = intervals
+		self.hidden_interval = hidden_interval
+
+		# Statistics
+		self.updates = 0
+		self.skips = 0
+
+	def interval(self, sprite: 'Sprite') -> int:  # NOQA
+		if not sprite.npc_action_trigger:
+			return self.hidden_interval
+
+		return self.intervals[bisect_right(self.distances, hypot(sprite.x - self.player.x, sprite.y - self.player.y))]
+
+	def due(self, npcs: List['Sprite'], tick: int) -> List[Tuple['Sprite', int]]:  # NOQA
+		scheduled: List[Tuple['Sprite', int]] = []  # NOQA
+
+		# Offsetting by the index spreads the NPCs of one level evenly over its ticks
+		for sprite in npcs:
+			interval: int = self.interval(sprite)
+
+			if (tick + sprite.index) % interval == 0:
+				scheduled.append((sprite, interval))
+
+		self.updates += len(scheduled)
+		self.skips += len(npcs) - len(scheduled)
+		return scheduled
+
+	@property
+	def stats(self) -> Dict[str, Number]:
+		return {'updates': self.updates, 'skips': self.skips}
+
+
+def state_digest(player: 'Player', sprites: 'Sprites') -> bytes:  # NOQA
+	# Everything the simulation decides, replays of the same input must end on the same digest
+	digest = hashlib.blake2b(digest_size=16)
+	digest.update(struct.pack('<ddd?', player.x, player.y, player.angle, player.shot))
+	digest.update(sprites.table.x.tobytes())
+	digest.update(sprites.table.y.tobytes())
+	digest.update(bytes(sprite.is_dead for sprite in sprites.list_of_objects))
+
+	return digest.digest()
@@ -1,30 +1,59 @@
 from collections import deque
-from math import sqrt, cos, atan2, degrees, inf
-from typing import FrozenSet
+from math import degrees, inf
+from typing import Dict, FrozenSet
 
+import numpy as np
 import pygame
 
+from assets import asset_cache
+from caches import ScaledFrameCache
+from map import level
 from player import Player
+from render_config import render_config
 from utilities import *
 
+# Viewing angle ranges of the eight directional frames, shared by every sprite
+SPRITE_ANGLES: Final[List[FrozenSet[int]]] = [frozenset(range(338, 360)) | frozenset(range(0, 23))] + \
+                                             [frozenset(range(i, i + 45)) for i in range(23, 338, 45)]
+
 
 class Sprites:
-	def __init__(self) -> None:
+	def __init__(self, placements: Optional[List[Tuple[int, Position]]] = None) -> None:
+		barrel: Dict[str, List[Surface]] = asset_cache.atlas('barrel', {
+			'base': ['../assets/sprites/barrel/base/0.png'],
+			'animations': [f'../assets/sprites/barrel/animations/{i}.png' for i in range(12)],
+			'death': [f'../assets/sprites/barrel/death/{i}.png' for i in range(4)]
+		})
+		pin: Dict[str, List[Surface]] = asset_cache.atlas('pin', {
+			'base': ['../assets/sprites/pin/base/0.png'],
+			'animations': [f'../assets/sprites/pin/animations/{i}.png' for i in range(8)]
+		})
+		devil: Dict[str, List[Surface]] = asset_cache.atlas('devil', {
+			'base': [f'../assets/sprites/devil/base/{i}.png' for i in range(8)],
+			'death': [f'../assets/sprites/devil/death/{i}.png' for i in range(6)],
+			'action': [f'../assets/sprites/devil/animations/{i}.png' for i in range(9)]
+		})
+		flame: Dict[str, List[Surface]] = asset_cache.atlas('flame', {
+			'base': ['../assets/sprites/flame/base/0.png'],
+			'animations': [f'../assets/sprites/flame/animations/{i}.png' for i in range(15, 0, -1)]
+		})
+		soldier: Dict[str, List[Surface]] = asset_cache.atlas('soldier', {
+			'base': [f'../assets/sprites/soldier/base/{i}.png' for i in range(8)],
+			'death': [f'../assets/sprites/soldier/death/{i}.png' for i in range(10)],
+			'action': [f'../assets/sprites/soldier/action/{i}.png' for i in range(4)]
+		})
+
 		self.sprite_parameters = {
 			SpriteType.BARREL: SpriteParameters(
-				sprite=pygame.image.load('../assets/sprites/barrel/base/0.png').convert_alpha(),
+				sprite=barrel['base'][0],
 				has_viewing_angles=False,
 				shift=1.8,
 				scale=(0.4, 0.4),
 				side=30,
-				animation=deque([
-					pygame.image.load(f'../assets/sprites/barrel/animations/{i}.png').convert_alpha() for i in range(12)
-				]),
+				animation=deque(barrel['animations']),
 				animation_dist=800,
 				animation_speed=10,
-				death_animation=deque([
-					pygame.image.load(f'../assets/sprites/barrel/death/{i}.png').convert_alpha() for i in range(4)
-				]),
+				death_animation=deque(barrel['death']),
 				death_type=DeathType.MORTAL,
 				death_shift=2.6,
 				is_blocked=True,
@@ -32,14 +61,12 @@ class Sprites:
 				object_action=deque()
 			),
 			SpriteType.PIN: SpriteParameters(
-				sprite=pygame.image.load('../assets/sprites/pin/base/0.png').convert_alpha(),
+				sprite=pin['base'][0],
 				has_viewing_angles=False,
 				shift=0.6,
 				scale=(0.6, 0.6),
 				side=30,
-				animation=deque([
-					pygame.image.load(f'../assets/sprites/pin/animations/{i}.png').convert_alpha() for i in range(8)
-				]),
+				animation=deque(pin['animations']),
 				animation_dist=800,
 				animation_speed=10,
 				death_type=DeathType.IMMORTAL,
@@ -50,7 +77,7 @@ class Sprites:
 				object_action=deque()
 			),
 			SpriteType.DEVIL: SpriteParameters(
-				sprite=[pygame.image.load(f'../assets/sprites/devil/base/{i}.png').convert_alpha() for i in range(8)],
+				sprite=devil['base'],
 				has_viewing_angles=True,
 				shift=-0.2,
 				scale=(1.1, 1.1),
@@ -58,27 +85,20 @@ class Sprites:
 				animation=deque(),
 				animation_dist=150,
 				animation_speed=10,
-				death_animation=deque([
-					pygame.image.load(f'../assets/sprites/devil/death/{i}.png').convert_alpha() for i in range(6)
-				]),
+				death_animation=deque(devil['death']),
 				death_type=DeathType.MORTAL,
 				death_shift=0.6,
 				is_blocked=True,
 				flag=Flag.NPC,
-				object_action=deque([
-					pygame.image.load(f'../assets/sprites/devil/animations/{i}.png').convert_alpha() for i in range(9)
-				])
+				object_action=deque(devil['action'])
 			),
 			SpriteType.FLAME: SpriteParameters(
-				sprite=pygame.image.load('../assets/sprites/flame/base/0.png').convert_alpha(),
+				sprite=flame['base'][0],
 				has_viewing_angles=False,
 				shift=0.7,
 				scale=(0.6, 0.6),
 				side=30,
-				animation=deque([
-					pygame.image.load(f'../assets/sprites/flame/animations/{i}.png').convert_alpha()
-					for i in range(15, 0, -1)
-				]),
+				animation=deque(flame['animations']),
 				animation_dist=800,
 				animation_speed=5,
 				death_animation=deque(),
@@ -89,7 +109,7 @@ class Sprites:
 				object_action=deque()
 			),
 			SpriteType.SOLIDER: SpriteParameters(
-				sprite=[pygame.image.load(f'../assets/sprites/soldier/base/{i}.png').convert_alpha() for i in range(8)],
+				sprite=soldier['base'],
 				has_viewing_angles=True,
 				shift=0.8,
 				scale=(0.4, 0.6),
@@ -97,52 +117,118 @@ class Sprites:
 				animation=deque(),
 				animation_dist=None,
 				animation_speed=6,
-				death_animation=deque([
-					pygame.image.load(f'../assets/sprites/soldier/death/{i}.png').convert_alpha() for i in range(10)
-				]),
+				death_animation=deque(soldier['death']),
 				death_type=DeathType.MORTAL,
 				death_shift=1.7,
 				is_blocked=True,
 				flag=Flag.NPC,
-				object_action=deque([
-					pygame.image.load(f'../assets/sprites/soldier/action/{i}.png').convert_alpha() for i in range(4)
-				])
+				object_action=deque(soldier['action'])
 			)
 		}
-		self.list_of_objects = [
-			Sprite(self.sprite_parameters[SpriteType.BARREL], (7.1, 2.1)),
-			Sprite(self.sprite_parameters[SpriteType.BARREL], (5.9, 2.1)),
-			Sprite(self.sprite_parameters[SpriteType.PIN], (8.7, 2.5)),
-			Sprite(self.sprite_parameters[SpriteType.DEVIL], (7.0, 4.0)),
-			Sprite(self.sprite_parameters[SpriteType.FLAME], (8.6, 5.6)),
-			Sprite(self.sprite_parameters[SpriteType.SOLIDER], (2.5, 1.5)),
-			Sprite(self.sprite_parameters[SpriteType.SOLIDER], (5.51, 1.5)),
-			Sprite(self.sprite_parameters[SpriteType.SOLIDER], (6.61, 2.92)),
-			Sprite(self.sprite_parameters[SpriteType.SOLIDER], (7.68, 1.47)),
-			Sprite(self.sprite_parameters[SpriteType.SOLIDER], (8.75, 3.65)),
-			Sprite(self.sprite_parameters[SpriteType.SOLIDER], (1.27, 11.5)),
-			Sprite(self.sprite_parameters[SpriteType.SOLIDER], (1.26, 8.29))
-		]
+
+		self.frame_cache = ScaledFrameCache()
+		self.tick = 0
+		self.spawn(level.placements if placements is None else placements)
+
+	def spawn(self, placements: List[Tuple[int, Position]]) -> None:
+		self.table = SpriteTable(len(placements))
+		self.list_of_objects = [Sprite(self.sprite_parameters[sprite_type], position, self.table, i)
+		                        for i, (sprite_type, position) in enumerate(placements)]
+
+	def update(self, player: Player) -> Tuple[np.ndarray, np.ndarray]:
+		table: SpriteTable = self.table
+		dx, dy = table.x - player.x, table.y - player.y
+		distance: np.ndarray = np.sqrt(dx * dx + dy * dy)
+		theta: np.ndarray = np.arctan2(dy, dx)
+		gamma: np.ndarray = theta - player.angle
+
+		if 180 <= degrees(player.angle) <= 360:
+			gamma[(dx > 0) | (dx < 0) & (dy < 0)] += DOUBLE_PI
+		else:
+			gamma[(dx < 0) & (dy < 0)] += DOUBLE_PI
+
+		table.theta[:] = theta - 1.4 * gamma
+		table.current_ray[:] = render_config.center_ray + np.trunc(gamma / render_config.delta_angle).astype(np.int64)
+		table.distance[:] = distance * np.cos(HALF_FOV - table.current_ray * render_config.delta_angle)
+
+		# Only sprites inside the FOV window go on to the depth test
+		fake_rays: int = render_config.fake_rays
+		visible: np.ndarray = ((table.current_ray + fake_rays >= 0)
+		                       & (table.current_ray + fake_rays <= render_config.fake_rays_range) & (table.distance > 30)
+		                       & (table.distance < render_config.max_depth))
+		indices: np.ndarray = np.flatnonzero(visible)
+		projection_heights: np.ndarray = np.minimum(
+			(render_config.projection_coefficient / table.distance[indices]).astype(np.int64), DOUBLE_HEIGHT
+		)
+		table.projection_height[:] = 0
+		table.projection_height[indices] = projection_heights
+
+		return indices, projection_heights
+
+	def locate(self, player: Player, depth_buffer: Optional[np.ndarray] = None) -> ProjectedSprites:
+		table: SpriteTable = self.table
+		scale: int = render_config.scale
+		indices, projection_heights = self.update(player)
+
+		# Screen span of every sprite and the ray columns where it is in front of the walls
+		lefts: np.ndarray = (table.current_ray[indices] * scale
+		                     - (projection_heights * table.scale_y[indices]).astype(np.int64) // 2)
+		rights: np.ndarray = lefts + (projection_heights * table.scale_x[indices]).astype(np.int64)
+		rays: np.ndarray = np.arange(render_config.number_rays)
+		columns: np.ndarray = (rays >= (lefts // scale)[:, None]) & (rays <= ((rights - 1) // scale)[:, None])
+
+		if depth_buffer is not None:
+			columns &= depth_buffer > table.distance[indices][:, None]
+
+		# Hidden sprites are skipped before scaling, the rest are clipped to their visible runs
+		keep: np.ndarray = columns.any(axis=1)
+		projected_sprites: ProjectedSprites = []
+
+		for row, i, left, right in zip(columns[keep], indices[keep].tolist(), lefts[keep].tolist(),
+		                               rights[keep].tolist()):
+			edges: List[int] = np.flatnonzero(np.diff(row, prepend=False, append=False)).tolist()
+			runs: List[Tuple[int, int]] = [(max(start * scale, left), min(end * scale, right))
+			                               for start, end in zip(edges[::2], edges[1::2])]
+			projected_sprites.append((*self.list_of_objects[i].project(self.frame_cache, self.tick), runs))
+
+		return projected_sprites
 
 	@property
 	def sprite_shot(self):
 		return min([sprite.is_on_fire for sprite in self.list_of_objects], default=(inf, 0))
 
 
+class SpriteTable:
+	def __init__(self, size: int) -> None:
+		self.x = np.zeros(size)
+		self.y = np.zeros(size)
+		self.distance = np.zeros(size)
+		self.theta = np.zeros(size)
+		self.current_ray = np.zeros(size, dtype=np.int64)
+		self.projection_height = np.zeros(size, dtype=np.int64)
+		self.scale_x = np.zeros(size)
+		self.scale_y = np.zeros(size)
+
+
 class Sprite:
-	def __init__(self, parameters: SpriteParameters, position: Position) -> None:
-		self.object = parameters.sprite.copy()
+	def __init__(self, parameters: SpriteParameters, position: Position, table: Optional[SpriteTable] = None,
+	             index: int = 0) -> None:
+		self.table = table if table is not None else SpriteTable(1)
+		self.index = index
+		self.object = parameters.sprite
 		self.has_viewing_angles = parameters.has_viewing_angles
 		self.shift = parameters.shift
 		self.scale = parameters.scale
 		self.side = parameters.side
 		self.x, self.y = position[0] * TILE, position[1] * TILE
+		self.table.scale_x[index], self.table.scale_y[index] = self.scale
 
 		# Animation
 		self.animation = parameters.animation.copy()
 		self.animation_dist = parameters.animation_dist
 		self.animation_speed = parameters.animation_speed
 		self.animation_count = 0
+		self.last_tick = 0
 
 		# Death
 		self.death_animation = parameters.death_animation.copy()
@@ -158,83 +244,120 @@ class Sprite:
 		# NPC
 		self.object_action = parameters.object_action.copy()
 		self.npc_action_trigger = False
+		self.npc_alerted = False
 
 		if self.has_viewing_angles:
-			self.sprite_angles = [frozenset(range(338, 360)) | frozenset(range(0, 23))] + \
-			                     [frozenset(range(i, i + 45)) for i in range(23, 338, 45)]
-			self.sprite_positions = {angle: pos for angle, pos in zip(self.sprite_angles, self.object)}
+			self.sprite_positions = {angle: pos for angle, pos in zip(SPRITE_ANGLES, self.object)}
 
 		# Defaults
-		self.distance_to_sprite = 0.0
-		self.theta = 0.0
-		self.current_ray = 0
-		self.projection_height = 0
 		self.dead_sprite = None
 
+	@property
+	def x(self) -> float:
+		return self.table.x[self.index]
+
+	@x.setter
+	def x(self, value: float) -> None:
+		self.table.x[self.index] = value
+
+	@property
+	def y(self) -> float:
+		return self.table.y[self.index]
+
+	@y.setter
+	def y(self, value: float) -> None:
+		self.table.y[self.index] = value
+
+	@property
+	def distance_to_sprite(self) -> float:
+		return self.table.distance[self.index]
+
+	@property
+	def theta(self) -> float:
+		return self.table.theta[self.index]
+
+	@theta.setter
+	def theta(self, value: float) -> None:
+		self.table.theta[self.index] = value
+
+	@property
+	def current_ray(self) -> int:
+		return int(self.table.current_ray[self.index])
+
+	@property
+	def projection_height(self) -> int:
+		return int(self.table.projection_height[self.index])
+
 	@property
 	def position(self) -> Position:
 		return self.x - self.side // 2, self.y - self.side // 2
 
 	@property
 	def is_on_fire(self) -> Tuple[float, int]:
-		if CENTER_RAY - self.side // 2 < self.current_ray < CENTER_RAY + self.side // 2 and self.is_blocked:
+		center_ray: int = render_config.center_ray
+
+		if center_ray - self.side // 2 < self.current_ray < center_ray + self.side // 2 and self.is_blocked:
 			return self.distance_to_sprite, self.projection_height
 
 		return inf, 0
 
-	def object_locate(self, player: Player) -> Tuple[float, Surface, Position] | Tuple[bool]:
-		dx, dy = self.x - player.x, self.y - player.y
-		self.distance_to_sprite: float = sqrt(dx ** 2 + dy ** 2)
-		self.theta: float = atan2(dy, dx)
-		gamma: float = self.theta - player.angle
-
-		if dx > 0 and 180 <= degrees(player.angle) <= 360 or dx < 0 and dy < 0:
-			gamma += DOUBLE_PI
+	def project(self, frame_cache: Optional[ScaledFrameCache] = None,
+	            tick: int = 0) -> Tuple[float, Surface, Position]:
+		# Animations follow the simulation ticks since the sprite was last drawn, not the rendered frames
+		self.animate(tick - self.last_tick)
+		self.last_tick = tick
+
+		projection_height: int = self.projection_height
+		sprite_width: int = int(projection_height * self.scale[0])
+		sprite_height: int = int(projection_height * self.scale[1])
+		half_sprite_height: int = sprite_height // 2
+
+		shift: float = half_sprite_height * self.shift
+		if self.is_dead and self.death_type != DeathType.IMMORTAL:
+			sprite_object: Surface = self.dead_animation()
+			shift = half_sprite_height * self.death_shift
+			sprite_height = int(sprite_height / 1.3)
+		elif self.npc_action_trigger:
+			sprite_object: Surface = self.npc_action()
+		else:
+			self.object = self.visible_sprite()
+			sprite_object: Surface = self.sprite_animation()
 
-		self.theta -= 1.4 * gamma
+		if isinstance(sprite_object, list):
+			sprite_object = sprite_object[0]
 
-		self.current_ray: int = CENTER_RAY + int(gamma / DELTA_ANGLE)
-		self.distance_to_sprite *= cos(HALF_FOV - self.current_ray * DELTA_ANGLE)
+		sprite_position: Position = (self.current_ray * render_config.scale - half_sprite_height,
+		                             HALF_HEIGHT - half_sprite_height + shift)
+		if frame_cache is not None:
+			sprite: Surface = frame_cache.scale(sprite_object, sprite_width, sprite_height)
+		else:
+			sprite: Surface = pygame.transform.scale(sprite_object, (sprite_width, sprite_height))
 
-		if 0 <= self.current_ray + FAKE_RAYS <= FAKE_RAYS_RANGE and self.distance_to_sprite > 30:
-			self.projection_height: int = min(int(PROJECTION_COEFFICIENT / self.distance_to_sprite), DOUBLE_HEIGHT)
+		return float(self.distance_to_sprite), sprite, sprite_position
 
-			sprite_width: int = int(self.projection_height * self.scale[0])
-			sprite_height: int = int(self.projection_height * self.scale[1])
-			half_sprite_height: int = sprite_height // 2
+	def animate(self, ticks: int) -> None:
+		# Catching up on more than one full cycle would only repeat it
+		cycle: int = (self.animation_speed + 1) * max(len(self.animation), len(self.death_animation),
+		                                              len(self.object_action), 1)
 
-			shift: float = half_sprite_height * self.shift
+		for _ in range(min(ticks, cycle)):
 			if self.is_dead and self.death_type != DeathType.IMMORTAL:
-				sprite_object: Surface = self.dead_animation()
-				shift = half_sprite_height * self.death_shift
-				sprite_height = int(sprite_height / 1.3)
-			elif self.npc_action_trigger:
-				sprite_object: Surface = self.npc_action()
-			else:
-				self.object = self.visible_sprite()
-				sprite_object: Surface = self.sprite_animation()
-
-			if isinstance(sprite_object, list):
-				sprite_object = sprite_object[0]
-
-			sprite_position: Position = self.current_ray * SCALE - half_sprite_height, HALF_HEIGHT - half_sprite_height + shift
-			sprite: Surface = pygame.transform.scale(sprite_object, (sprite_width, sprite_height))
-
-			return self.distance_to_sprite, sprite, sprite_position
-		else:
-			return False,
+				if len(self.death_animation):
+					if self.death_animation_count < self.animation_speed:
+						self.death_animation_count += 1
+					else:
+						self.dead_sprite = self.death_animation.popleft()
+						self.death_animation_count = 0
+			elif self.npc_action_trigger or self.animation and self.distance_to_sprite < self.animation_dist:
+				if self.animation_count < self.animation_speed:
+					self.animation_count += 1
+				else:
+					(self.object_action if self.npc_action_trigger else self.animation).rotate()
+					self.animation_count = 0
 
 	def sprite_animation(self) -> Surface | Surfaces:
 		if self.animation and self.distance_to_sprite < self.animation_dist:
-			sprite_object = self.animation[0]
-
-			if self.animation_count < self.animation_speed:
-				self.animation_count += 1
-			else:
-				self.animation.rotate()
-				self.animation_count = 0
-
-			return sprite_object
+			return self.animation[0]
 
 		return self.object
 
@@ -245,30 +368,14 @@ class Sprite:
 
 			theta = 360 - int(degrees(self.theta))
 
-			for angles in self.sprite_angles:
+			for angles in SPRITE_ANGLES:
 				if theta in angles:
 					return self.sprite_positions[angles]
 
 		return self.object
 
 	def dead_animation(self) -> Surface:
-		if len(self.death_animation):
-			if self.death_animation_count < self.animation_speed:
-				self.dead_sprite = self.death_animation[0]
-				self.death_animation_count += 1
-			else:
-				self.dead_sprite = self.death_animation.popleft()
-				self.death_animation_count = 0
-
-		return self.dead_sprite
+		return self.death_animation[0] if len(self.death_animation) else self.dead_sprite
 
 	def npc_action(self) -> Surface:
-		sprite_object: Surface = self.object_action[0]
-
-		if self.animation_count < self.animation_speed:
-			self.animation_count += 1
-		else:
-			self.object_action.rotate()
-			self.animation_count = 0
-
-		return sprite_object
+		return self.object_action[0]
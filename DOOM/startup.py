@@ -0,0 +1,73 @@
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class StartupProfiler:
+	def __init__(self) -> None:
+		self.start = perf_counter()
+		self.phases: Dict[str, float] = {}
+
+	@contextmanager
+	def phase(self, name: str) -> Iterator[None]:
+		start: float = perf_counter()
+
+		try:
+			yield
+		finally:
+			self.phases[name] = self.phases.get(name, 0.0) + (perf_counter() - start) * 1000
+
+	@property
+	def total(self) -> float:
+		return (perf_counter() - self.start) * 1000
+
+	def report(self) -> str:
+		total: float = self.total
+		lines: List[str] = [f'{"phase":<32}{"ms":>10}']
+		lines += [f'{name:<32}{value:>10.1f}' for name, value in self.phases.items()]
+		lines += [f'{"other":<32}{total - sum(self.phases.values()):>10.1f}', f'{"total":<32}{total:>10.1f}']
+
+		return '\n'.join(lines)
+
+
+def warm_up_kernels(profiler: StartupProfiler, engine: Optional[int] = None) -> None:
+	# Imported here so that the profiler itself stays free of heavy imports
+	import numpy as np
+
+	from interaction import ray_casting_npcs_player
+	from map import level
+	from pathfinding import flow_field
+	from ray_casting import cast_floor, cast_walls
+	from pygame import Surface
+	from pygame.surfarray import pixels2d
+	from utilities import (FLOW_FIELD_RADIUS, FLOOR_TEXTURE_SIZE, HALF_HEIGHT, HEIGHT, PLAYER_POSITION, PLAYER_ANGLE,
+	                       RAY_CASTING_ENGINE, WIDTH, RayCastingEngine)
+
+	# Same argument types as the game passes, so no other specialization is compiled later
+	position: Tuple[int, int] = int(PLAYER_POSITION[0]), int(PLAYER_POSITION[1])
+
+	# The dictionary of the legacy engine is only built when that engine is used
+	if (engine if engine is not None else RAY_CASTING_ENGINE) == RayCastingEngine.DICT:
+		with profiler.phase('jit: ray_casting'):
+			cast_walls(position, PLAYER_ANGLE, RayCastingEngine.DICT)
+
+	with profiler.phase('jit: ray_casting_grid'):
+		cast_walls(position, PLAYER_ANGLE, RayCastingEngine.GRID)
+
+	with profiler.phase('jit: ray_casting_parallel'):
+		cast_walls(position, PLAYER_ANGLE, RayCastingEngine.PARALLEL)
+
+	with profiler.phase('jit: ray_casting_npcs_player'):
+		ray_casting_npcs_player(np.array([PLAYER_POSITION], dtype=np.float64), level.streamer.window, position)
+
+	with profiler.phase('jit: flow_field'):
+		window: np.ndarray = level.streamer.window
+		flow_field(window, 0, 0, FLOW_FIELD_RADIUS, np.empty(window.shape, dtype=np.int32),
+		           np.empty(window.shape, dtype=np.int8))
+
+	with profiler.phase('jit: cast_floor'):
+		# A screen sized 32 bit surface has the memory layout of the display surface
+		directions: np.ndarray = np.zeros(WIDTH)
+		cast_floor(pixels2d(Surface((WIDTH, HEIGHT), 0, 32)),
+		           np.zeros((1, FLOOR_TEXTURE_SIZE, FLOOR_TEXTURE_SIZE), dtype=np.uint32), np.ones(HALF_HEIGHT),
+		           np.zeros(HALF_HEIGHT, dtype=np.int64), directions, directions, 0.0, 0.0, 1)
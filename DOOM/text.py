@@ -0,0 +1,67 @@
+import os
+from typing import Dict
+
+import pygame
+from pygame.font import Font
+
+from caches import SurfaceCache
+from utilities import *
+
+
+class TextCache:
+	def __init__(self, memory_limit: int = TEXT_CACHE_MEMORY) -> None:
+		self.fonts: Dict[FontSpec, Font] = {}
+		self.rendered = SurfaceCache(memory_limit)
+
+		# Statistics
+		self.numbers = 0
+
+	def font(self, spec: FontSpec) -> Font:
+		font: Optional[Font] = self.fonts.get(spec)
+
+		# Font files are opened once, system fonts are looked up once
+		if font is None:
+			name, size, bold = spec
+
+			if os.path.splitext(name)[1]:
+				font = Font(name, size)
+				font.set_bold(bold)
+			else:
+				font = pygame.font.SysFont(name, size, bold=bold)
+
+			self.fonts[spec] = font
+
+		return font
+
+	def render(self, text: str, spec: FontSpec, color: Color, antialias: bool = True) -> Surface:
+		key: Tuple[str, FontSpec, Color, bool] = text, spec, color, antialias
+		surface: Optional[Surface] = self.rendered.get(key)
+
+		if surface is None:
+			surface = self.rendered.put(key, self.font(spec).render(text, antialias, color))
+
+		return surface
+
+	def number(self, value: int, spec: FontSpec, color: Color, antialias: bool = True) -> Surface:
+		# Readouts change too often to cache every value, so they are put together from cached digits
+		glyphs: Surfaces = [self.render(character, spec, color, antialias) for character in str(value)]
+		surface: Surface = Surface((sum(glyph.get_width() for glyph in glyphs),
+		                            max(glyph.get_height() for glyph in glyphs)), pygame.SRCALPHA)
+		x: int = 0
+
+		# Glyphs do not overlap, so antialiased ones are copied unblended by taking the maximum, the colorkey of the
+		# others only holds for plain blits
+		for glyph in glyphs:
+			blend: int = pygame.BLEND_RGBA_MAX if glyph.get_flags() & pygame.SRCALPHA else 0
+			surface.blit(glyph, (x, 0), special_flags=blend)
+			x += glyph.get_width()
+
+		self.numbers += 1
+		return surface
+
+	@property
+	def stats(self) -> Dict[str, Number]:
+		return {'fonts': len(self.fonts), 'numbers': self.numbers, **self.rendered.stats}
+
+
+text_cache: TextCache = TextCache()
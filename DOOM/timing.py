@@ -0,0 +1,130 @@
+import json
+from collections import deque
+from contextlib import nullcontext
+from time import perf_counter
+from typing import Dict, ContextManager, TextIO
+
+import pygame
+
+from text import text_cache
+from utilities import *
+
+NULL_SCOPE: Final[ContextManager] = nullcontext()
+
+
+class TimingScope:
+	def __init__(self, timer: 'FrameTimer', name: str) -> None:
+		self.timer = timer
+		self.name = name
+		self.start = 0.0
+
+	def __enter__(self) -> None:
+		self.start = perf_counter()
+
+	def __exit__(self, *_) -> None:
+		self.timer.frame[self.name] = self.timer.frame.get(self.name, 0.0) + (perf_counter() - self.start) * 1000
+
+
+class FrameTimer:
+	def __init__(self, enabled: bool = FRAME_TIMER_ENABLED, window: int = FRAME_TIMER_WINDOW,
+	             trace_file: Optional[PathLikeString] = None) -> None:
+		self.enabled = enabled or trace_file is not None
+		self.overlay = enabled
+		self.window = window
+		self.scopes: Dict[str, TimingScope] = {}
+		self.stages: Dict[str, Deque[float]] = {}
+		self.totals: Deque[float] = deque(maxlen=window)
+		self.frame: Dict[str, float] = {}
+		self.frame_start = 0.0
+		self.frame_count = 0
+
+		# Trace
+		self.trace: Optional[TextIO] = open(trace_file, 'w', encoding='utf-8') if trace_file is not None else None
+		self.trace_csv = trace_file is not None and str(trace_file).endswith('.csv')
+		self.trace_columns: List[str] = []
+
+		# Overlay
+		self.overlay_surface = Surface(FRAME_TIMER_OVERLAY_SIZE, pygame.SRCALPHA)
+
+	def scope(self, name: str) -> ContextManager:
+		if not self.enabled:
+			return NULL_SCOPE
+
+		if name not in self.scopes:
+			self.scopes[name] = TimingScope(self, name)
+
+		return self.scopes[name]
+
+	def begin_frame(self) -> None:
+		if self.enabled:
+			self.frame = {}
+			self.frame_start = perf_counter()
+
+	def end_frame(self) -> None:
+		if not self.enabled:
+			return
+
+		total: float = (perf_counter() - self.frame_start) * 1000
+		self.totals.append(total)
+
+		for name, value in self.frame.items():
+			if name not in self.stages:
+				self.stages[name] = deque(maxlen=self.window)
+
+			self.stages[name].append(value)
+
+		if self.trace is not None:
+			self.write_trace(total)
+
+		self.frame_count += 1
+
+	def write_trace(self, total: float) -> None:
+		if not self.trace_csv:
+			self.trace.write(json.dumps({'frame': self.frame_count, 'total': total, **self.frame}) + '\n')
+			return
+
+		if not self.trace_columns:
+			self.trace_columns = list(self.frame)
+			self.trace.write(','.join(['frame', 'total'] + self.trace_columns) + '\n')
+
+		values: List[str] = [f'{self.frame.get(name, 0.0):.4f}' for name in self.trace_columns]
+		self.trace.write(','.join([str(self.frame_count), f'{total:.4f}'] + values) + '\n')
+
+	@staticmethod
+	def average(values: Deque[float]) -> float:
+		return sum(values) / len(values) if values else 0.0
+
+	def draw(self, screen: Surface) -> None:
+		if not self.overlay or not self.totals:
+			return
+
+		width, height = FRAME_TIMER_OVERLAY_SIZE
+		graph_height: int = height // 3
+		self.overlay_surface.fill((*BLACK, 160))
+
+		# Rolling per-stage milliseconds
+		lines: List[Tuple[str, float]] = [(name, self.average(values)) for name, values in self.stages.items()]
+		lines.append(('total', self.average(self.totals)))
+
+		# Stage names repeat every frame, the values rarely do and are rendered with the cached font directly
+		for i, (name, value) in enumerate(lines):
+			self.overlay_surface.blit(text_cache.render(name, TIMING_FONT, LIGHT_GRAY), (5, 5 + i * 16))
+			self.overlay_surface.blit(text_cache.font(TIMING_FONT).render(f'{value:.2f} ms', True, LIGHT_GRAY),
+			                          (width - 75, 5 + i * 16))
+
+		# Frame time graph with the FPS budget line
+		budget: float = 1000 / FPS
+		scale: float = graph_height / max(max(self.totals), budget * 2)
+		budget_y: float = height - budget * scale
+		pygame.draw.line(self.overlay_surface, RED, (0, budget_y), (width, budget_y))
+
+		for i, total in enumerate(self.totals):
+			x: float = i * width / self.window
+			pygame.draw.line(self.overlay_surface, YELLOW, (x, height), (x, height - total * scale))
+
+		screen.blit(self.overlay_surface, FRAME_TIMER_OVERLAY_POSITION)
+
+	def close(self) -> None:
+		if self.trace is not None:
+			self.trace.close()
+			self.trace = None
@@ -12,8 +12,10 @@ Scale: TypeAlias = Tuple[float, float]
 Surfaces: TypeAlias = List[Surface]
 Walls: TypeAlias = List[Tuple[float, Surface, Position]]
 CastedWalls: TypeAlias = List[Tuple[float, int, int, int]]
+ProjectedSprites: TypeAlias = List[Tuple[float, Surface, Position, List[Tuple[int, int]]]]
 Color: TypeAlias = Tuple[int, int, int]
 PathLikeString: TypeAlias = str | bytes | PathLike
+FontSpec: TypeAlias = Tuple[str, int, bool]
 
 # Display
 WIDTH: Final[int] = 1200
@@ -23,18 +25,50 @@ HALF_HEIGHT: Final[int] = HEIGHT // 2
 DOUBLE_HEIGHT: Final[int] = HEIGHT * 2
 TILE: Final[int] = 100
 FPS_LABEL_POSITION: Final[Position] = WIDTH - 50, 5
+VIEWPORT: Final[Tuple[int, int, int, int]] = 0, 0, WIDTH, HEIGHT
 FPS: Final[int] = 60
 
+# Frame timing
+FRAME_TIMER_ENABLED: Final[bool] = False
+FRAME_TIMER_WINDOW: Final[int] = 120
+FRAME_TIMER_OVERLAY_SIZE: Final[Position] = 300, 300
+FRAME_TIMER_OVERLAY_POSITION: Final[Position] = WIDTH - 310, 40
+
+# Simulation
+TICK_RATE: Final[int] = 60
+MAX_TICKS_PER_FRAME: Final[int] = 5
+NPC_SPEED: Final[int] = 1
+NPC_LOD_DISTANCES: Final[Tuple[int, ...]] = 8 * TILE, 16 * TILE
+NPC_LOD_INTERVALS: Final[Tuple[int, ...]] = 1, 2, 4
+NPC_LOD_HIDDEN_INTERVAL: Final[int] = 8
+FLOW_FIELD_RADIUS: Final[int] = 24
+
+# Map
+MAP_FILE: Final[str] = '../assets/data/map.txt'
+SPAWN_EXTENSION: Final[str] = '.spawns'
+
+# World streaming
+WORLD_CHUNK: Final[int] = 32
+WORLD_CHUNK_RADIUS: Final[int] = 2
+WORLD_CHUNK_CACHE: Final[int] = 64
+MAX_DRAW_DISTANCE: Final[int] = WORLD_CHUNK * WORLD_CHUNK_RADIUS * TILE
+FOG_START: Final[float] = 0.6
+FOG_LEVELS: Final[int] = 16
+
 # Minimap
 MINIMAP_SCALE: Final[int] = 5
 MINIMAP_RESOLUTION: Final[Position] = (WIDTH // MINIMAP_SCALE, HEIGHT // MINIMAP_SCALE)
 MAP_SCALE: Final[int] = MINIMAP_SCALE * 2
 MAP_TILE: Final[int] = TILE // MAP_SCALE
 MAP_POSITION: Final[Position] = 0, HEIGHT - HEIGHT // MINIMAP_SCALE
+MINIMAP_ZOOM_LEVELS: Final[Tuple[int, ...]] = MAP_TILE // 2, MAP_TILE, MAP_TILE * 2
+MINIMAP_ZOOM: Final[int] = 1
+MINIMAP_CHUNK: Final[int] = 32
+MINIMAP_CACHE_MEMORY: Final[int] = 8 * 1024 * 1024
 
 # Player
 PLAYER_POSITION: Position = HALF_WIDTH // 4, HALF_HEIGHT
-PLAYER_ANGLE: Final[float] = 0
+PLAYER_ANGLE: Final[float] = 0.0
 PLAYER_SPEED: Final[int] = 4
 PLAYER_ROTATION_SPEED: Final[float] = 0.03
 PLAYER_MOUSE_SENSITIVITY: Final[float] = 300
@@ -49,10 +83,47 @@ DIST: Final[float] = NUMBER_RAYS / (2 * tan(HALF_FOV))
 PROJECTION_COEFFICIENT: Final[float] = 3 * DIST * TILE
 SCALE: Final[int] = WIDTH // NUMBER_RAYS
 
+# Render governor
+RENDER_GOVERNOR_ENABLED: Final[bool] = False
+RENDER_RAY_LEVELS: Final[Tuple[int, ...]] = 100, 150, 200, 240, 300, 400, 600
+GOVERNOR_WINDOW: Final[int] = 30
+GOVERNOR_DOWNGRADE: Final[float] = 1.0
+GOVERNOR_UPGRADE: Final[float] = 0.6
+
 # Textures settings
 TEXTURE_SIZE: Final[int] = 1200
 HALF_TEXTURE_SIZE: Final[int] = TEXTURE_SIZE // 2
 TEXTURE_SCALE: Final[int] = TEXTURE_SIZE // TILE
+MIPMAP_LEVELS: Final[int] = 7
+WALL_FOG_SHADING: Final[bool] = True
+WALL_FOG_MIPMAP_LEVEL: Final[int] = 3
+
+# Floor casting
+FLOOR_CASTING: Final[bool] = True
+FLOOR_TEXTURE_FILE: Final[str] = '../assets/images/wall 3.png'
+FLOOR_TEXTURE_SIZE: Final[int] = 256
+FLOOR_BUDGET: Final[float] = 2.0
+FLOOR_STEPS: Final[Tuple[int, ...]] = 1, 2, 3, 4, 6, 8
+
+# Caching
+WALL_CACHE_MEMORY: Final[int] = 64 * 1024 * 1024
+WALL_CACHE_HEIGHT_STEP: Final[int] = 2
+SPRITE_CACHE_MEMORY: Final[int] = 64 * 1024 * 1024
+SPRITE_CACHE_ENTRY_MEMORY: Final[int] = 256 * 1024
+SPRITE_CACHE_SIZE_STEP: Final[int] = 4
+
+# Text, a font is a system font name or a font file path, its size and whether it is bold
+TEXT_CACHE_MEMORY: Final[int] = 8 * 1024 * 1024
+FPS_FONT: Final[FontSpec] = 'Arial', 30, True
+WIN_FONT: Final[FontSpec] = '../assets/fonts/font 1.ttf', 144, False
+MENU_BUTTON_FONT: Final[FontSpec] = '../assets/fonts/font 1.ttf', 72, False
+MENU_TITLE_FONT: Final[FontSpec] = '../assets/fonts/font 2.ttf', 400, False
+TIMING_FONT: Final[FontSpec] = 'Arial', 14, True
+
+# Asset cache
+ASSET_CACHE_ENABLED: Final[bool] = True
+ASSET_CACHE_DIRECTORY: Final[str] = '../assets/cache'
+ASSET_ATLAS_SIZE: Final[int] = 8192
 
 # Texture types
 VOID: Final[int] = 0
@@ -62,6 +133,7 @@ WALL3: Final[int] = 3
 WALL4: Final[int] = 4
 SKY: Final[int] = 5
 MENU: Final[int] = 6
+FLOOR: Final[int] = 7
 
 # Sprites settings
 DOUBLE_PI: Final[float] = pi * 2
@@ -70,6 +142,26 @@ FAKE_RAYS: Final[int] = 100
 FAKE_RAYS_RANGE: Final[int] = NUMBER_RAYS - 1 + 2 * FAKE_RAYS
 
 
+# Ray casting engines
+class RayCastingEngine:
+	DICT: int = 0
+	GRID: int = 1
+	PARALLEL: int = 2
+
+
+RAY_CASTING_ENGINE: Final[int] = RayCastingEngine.GRID
+RAY_CASTING_THREADS: Final[int] = 0
+
+
+# Wall rendering modes
+class WallRendering:
+	BLIT: int = 0
+	FRAMEBUFFER: int = 1
+
+
+WALL_RENDERING: Final[int] = WallRendering.BLIT
+
+
 # Sprite types, flags and deaths enumerations
 class SpriteType:
 	BARREL: int = 0
@@ -116,3 +208,6 @@ DARK_BROWN: Final[Color] = 97, 61, 25
 LIGHT_GRAY: Final[Color] = 211, 211, 211
 DARK_GRAY: Final[Color] = 110, 110, 110
 BLACK: Final[Color] = 0, 0, 0
+
+# Fog
+FOG_COLOR: Final[Color] = BLACK